@@ -3,14 +3,22 @@ from tkinter import filedialog, messagebox
 from PIL import Image, ImageTk
 import numpy as np
 import cv2
-import pywt
-from scipy.fftpack import dct, idct
 import os
 import customtkinter
 
-# --- Set default appearance mode and color theme ---
-customtkinter.set_appearance_mode("System")
-customtkinter.set_default_color_theme("blue")
+from wavesecure.attacks import ATTACKS
+from wavesecure.core import (
+    EXTENSION_FORMATS, OUTPUT_FORMATS, convert_image, embed_prepared, embed_watermark_dwtdct, extract_watermark_dwtdct,
+    format_for_path, image_cache, load_original_coefficients, prepare_cover, save_image, search_alpha
+)
+from wavesecure.instrument import Trace, stage
+from wavesecure.jobs import JobExecutor
+
+PREVIEW_SIZE = 250
+# Live alpha preview: re-embed at most every PREVIEW_DELAY_MS while the slider moves,
+# refresh PSNR once it settles
+PREVIEW_DELAY_MS = 30
+PSNR_DELAY_MS = 250
 
 class WatermarkApp(customtkinter.CTk):
     def __init__(self):
@@ -23,12 +31,26 @@ class WatermarkApp(customtkinter.CTk):
         # Image paths and references
         self.original_img_path = None
         self.watermark_img_path = None
-        self.watermarked_img_path = None
-        self.extracted_img_path = None
+
+        # Decoded results are kept in memory and only encoded on explicit save
+        self.cover_img = None
+        self.watermarked_img = None
+        self.extracted_img = None
         self.image_references = {}  # To prevent garbage collection
 
+        # Transformed cover kept for the live alpha preview (see prepare_preview)
+        self.preview_state = None
+        self.preview_pending = None
+        self.preview_after = None
+        self.psnr_after = None
+
+        # Heavy operations run on a background worker so the window stays responsive
+        self.jobs = JobExecutor()
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
         self.setup_ui()
         self.status_var.set("Ready")
+        self.after(50, self.poll_jobs)
 
     def setup_ui(self):
         # Configure grid weights
@@ -60,6 +82,7 @@ class WatermarkApp(customtkinter.CTk):
             ("Select Original", self.select_original),
             ("Select Watermark", self.select_watermark),
             ("Embed Watermark", self.embed_watermark),
+            ("Auto Alpha", self.auto_alpha),
             ("Save Watermarked", self.save_watermarked)
         ]
 
@@ -75,7 +98,8 @@ class WatermarkApp(customtkinter.CTk):
             ("Extract From File", self.extract_from_other),
             ("Save Extracted", self.save_extracted),
             ("Test Robustness", self.test_robustness),
-            ("Calculate PSNR", self.calculate_imperceptibility)
+            ("Calculate PSNR", self.calculate_imperceptibility),
+            ("Cancel Job", self.cancel_job)
         ]
 
         for col, (text, command) in enumerate(buttons2):
@@ -111,6 +135,56 @@ class WatermarkApp(customtkinter.CTk):
         alpha_entry = customtkinter.CTkEntry(param_frame, textvariable=self.alpha_var, width=50)
         alpha_entry.grid(row=0, column=5, padx=5, pady=5)
 
+        # Output codec used when saving results
+        customtkinter.CTkLabel(param_frame, text="Output Format:").grid(row=0, column=6, padx=5, pady=5)
+        self.format_var = tk.StringVar(value="PNG")
+        format_combo = customtkinter.CTkComboBox(
+            param_frame,
+            variable=self.format_var,
+            values=list(OUTPUT_FORMATS)
+        )
+        format_combo.grid(row=0, column=7, padx=5, pady=5)
+
+        customtkinter.CTkLabel(param_frame, text="JPEG Quality:").grid(row=0, column=8, padx=5, pady=5)
+        self.quality_var = tk.IntVar(value=95)
+        quality_entry = customtkinter.CTkEntry(param_frame, textvariable=self.quality_var, width=50)
+        quality_entry.grid(row=0, column=9, padx=5, pady=5)
+
+        # PSNR floor used by "Auto Alpha" (leave empty for an NC-only search)
+        customtkinter.CTkLabel(param_frame, text="Target PSNR (dB):").grid(row=1, column=0, padx=5, pady=5)
+        self.target_psnr_var = tk.StringVar(value="40")
+        target_entry = customtkinter.CTkEntry(param_frame, textvariable=self.target_psnr_var, width=50)
+        target_entry.grid(row=1, column=1, padx=5, pady=5)
+
+        # Live alpha slider; shares alpha_var with the entry above
+        customtkinter.CTkLabel(param_frame, text="Live Alpha:").grid(row=1, column=2, padx=5, pady=5)
+        alpha_slider = customtkinter.CTkSlider(
+            param_frame,
+            variable=self.alpha_var,
+            from_=0.0,
+            to=1.0,
+            number_of_steps=200,
+            command=self.on_alpha_changed
+        )
+        alpha_slider.grid(row=1, column=3, columnspan=2, padx=5, pady=5, sticky="ew")
+        self.psnr_var = tk.StringVar(value="PSNR: -")
+        customtkinter.CTkLabel(param_frame, textvariable=self.psnr_var).grid(row=1, column=5, columnspan=2, padx=5, pady=5)
+
+        # Optional NC floor for "Auto Alpha", scored after the chosen attack at its mildest setting
+        customtkinter.CTkLabel(param_frame, text="Min NC:").grid(row=2, column=0, padx=5, pady=5)
+        self.target_nc_var = tk.StringVar(value="")
+        nc_entry = customtkinter.CTkEntry(param_frame, textvariable=self.target_nc_var, width=50)
+        nc_entry.grid(row=2, column=1, padx=5, pady=5)
+
+        customtkinter.CTkLabel(param_frame, text="NC Attack:").grid(row=2, column=2, padx=5, pady=5)
+        self.attack_var = tk.StringVar(value="none")
+        attack_combo = customtkinter.CTkComboBox(
+            param_frame,
+            variable=self.attack_var,
+            values=["none"] + list(ATTACKS)
+        )
+        attack_combo.grid(row=2, column=3, padx=5, pady=5)
+
         # Status bar
         self.status_var = tk.StringVar()
         status_bar = customtkinter.CTkLabel(self, textvariable=self.status_var, anchor=tk.W, corner_radius=5)
@@ -137,12 +211,10 @@ class WatermarkApp(customtkinter.CTk):
         if file_path:
             try:
                 self.original_img_path = file_path
-                img = Image.open(file_path)
-                img = img.resize((250, 250), Image.Resampling.LANCZOS)
-                self.image_references["original"] = ImageTk.PhotoImage(img)
-                self.original_img_label.configure(image=self.image_references["original"])
+                # Decoded once here; embedding and extraction reuse the cached decode
+                self.show_image(image_cache.preview(file_path, PREVIEW_SIZE), self.original_img_label, "original")
                 self.status_var.set(f"Original image loaded: {os.path.basename(file_path)}")
-                self.watermarked_img_path = None
+                self.watermarked_img = None
                 self.watermarked_img_label.configure(image='')
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to load image:\n{str(e)}")
@@ -152,64 +224,254 @@ class WatermarkApp(customtkinter.CTk):
         if file_path:
             try:
                 self.watermark_img_path = file_path
-                img = Image.open(file_path)
-                img = img.resize((250, 250), Image.Resampling.LANCZOS)
-                self.image_references["watermark"] = ImageTk.PhotoImage(img)
-                self.watermark_img_label.configure(image=self.image_references["watermark"])
+                self.show_image(image_cache.preview(file_path, PREVIEW_SIZE), self.watermark_img_label, "watermark")
                 self.status_var.set(f"Watermark image loaded: {os.path.basename(file_path)}")
             except Exception as e:
                 messagebox.showerror("Error", f"Failed to load watermark:\n{str(e)}")
 
+    def poll_jobs(self):
+        """Apply progress and results reported by the background worker"""
+        try:
+            for job, message in self.jobs.poll():
+                queued = self.jobs.pending_count()
+                suffix = f" ({queued} queued)" if queued else ""
+                self.status_var.set(f"{message}{suffix}")
+        finally:
+            # Re-arm even if a completion callback raised, or the UI would stop seeing jobs
+            self.after(50, self.poll_jobs)
+
+    def run_job(self, name, work, on_done, error_message, failure_status):
+        """Queue `work(job)` on the worker; `on_done(result)` runs back on the UI thread"""
+        def on_error(e):
+            messagebox.showerror("Error", f"{error_message}:\n{str(e)}")
+            self.status_var.set(failure_status)
+
+        def on_cancel():
+            self.status_var.set(f"{name} cancelled.")
+
+        self.jobs.submit(name, work, on_done, on_error, on_cancel)
+        queued = self.jobs.pending_count()
+        if self.jobs.current is not None or queued > 1:
+            self.status_var.set(f"{name} queued ({queued} waiting).")
+
+    def cancel_job(self):
+        if not self.jobs.cancel_current():
+            self.status_var.set("No job is running.")
+            return
+        self.status_var.set("Cancelling...")
+
+    def on_close(self):
+        self.jobs.shutdown()
+        self.destroy()
+
+    def get_parameters(self):
+        """Read wavelet model, decomposition level and alpha from the UI"""
+        return self.wavelet_var.get(), int(self.level_var.get()), self.alpha_var.get()
+
+    def show_image(self, image_array, label, reference_key):
+        """Display an in-memory grayscale or RGB array in one of the preview panels"""
+        if image_array.shape[:2] != (PREVIEW_SIZE, PREVIEW_SIZE):
+            image_array = cv2.resize(image_array, (PREVIEW_SIZE, PREVIEW_SIZE), interpolation=cv2.INTER_AREA)
+        self.image_references[reference_key] = ImageTk.PhotoImage(Image.fromarray(image_array))
+        label.configure(image=self.image_references[reference_key])
+
+    def ask_save_path(self, initial_name):
+        """Ask where to save; returns (path, codec) with the codec following the chosen file name.
+
+        The selected output format is the default. A name with another
+        codec's extension (e.g. "x.jpg" while PNG is selected) is saved with
+        that codec; any other extension gets the selected format's appended.
+        """
+        fmt = self.format_var.get()
+        extension = OUTPUT_FORMATS[fmt]
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=extension,
+            filetypes=[(f"{fmt} files", f"*{extension}"), ("All files", "*.*")],
+            initialfile=f"{initial_name}{extension}"
+        )
+        if not file_path:
+            return None, fmt
+        if os.path.splitext(file_path)[1].lower() not in EXTENSION_FORMATS:
+            file_path += extension
+        return file_path, format_for_path(file_path)
+
     def embed_watermark(self):
         if not self.original_img_path or not self.watermark_img_path:
             messagebox.showwarning("Warning", "Please select both original and watermark images.")
             return
 
         try:
-            self.status_var.set("Embedding watermark...")
-            self.update()
+            model, level, alpha = self.get_parameters()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to embed watermark:\n{str(e)}")
+            return
+
+        original_img_path = self.original_img_path
+        watermark_img_path = self.watermark_img_path
+
+        def work(job):
+            with Trace("embed") as trace:
+                job.progress("Embedding watermark: reading images...")
+                original_img = convert_image(original_img_path, 512)
+                watermark = convert_image(watermark_img_path, 128)  # Fixed size for watermark
+
+                job.progress("Embedding watermark: DWT-DCT transform...")
+                watermarked_img = embed_watermark_dwtdct(original_img, watermark, model, level, alpha)
+            return original_img, watermarked_img, trace
+
+        def on_done(result):
+            self.cover_img, self.watermarked_img, trace = result
+            self.show_image(self.watermarked_img, self.watermarked_img_label, "watermarked")
 
-            # Read and process images
-            original_img = convert_image(self.original_img_path, 512)
-            watermark = convert_image(self.watermark_img_path, 128)  # Fixed size for watermark
+            self.status_var.set(f"Watermark embedded successfully. [{trace.summary()}]")
+            messagebox.showinfo("Success", "Watermark embedded successfully. Use 'Save Watermarked' to write it to disk.")
 
-            # Get parameters
-            model = self.wavelet_var.get()
-            level = int(self.level_var.get())
+        self.run_job("Embedding", work, on_done, "Failed to embed watermark", "Watermark embedding failed.")
+
+    def preview_key(self):
+        """Inputs the cached preview transform depends on, or None if they are incomplete"""
+        if not self.original_img_path or not self.watermark_img_path:
+            return None
+        try:
+            model, level, _ = self.get_parameters()
+        except Exception:
+            return None
+        return self.original_img_path, self.watermark_img_path, model, level
+
+    def on_alpha_changed(self, value):
+        """Slider callback; throttles the preview to one update per PREVIEW_DELAY_MS while dragging"""
+        # Never cancel: a pending update reads the latest alpha when it fires, so
+        # continuous drags keep refreshing instead of waiting for the slider to stop
+        if self.preview_after is None:
+            self.preview_after = self.after(PREVIEW_DELAY_MS, self.update_preview)
+
+    def prepare_preview(self, key):
+        """Transform the cover once in the background; later alpha changes only redo modulation and inverse"""
+        if self.preview_pending == key:
+            return
+        self.preview_pending = key
+        original_img_path, watermark_img_path, model, level = key
+
+        def work(job):
+            job.progress("Preparing live preview...")
+            cover = convert_image(original_img_path, 512)
+            watermark = convert_image(watermark_img_path, 128)
+            coeffs, LL_dct = prepare_cover(cover, model, level)
+            return dict(key=key, cover=cover, watermark=watermark, model=model, coeffs=coeffs, LL_dct=LL_dct)
+
+        def on_done(state):
+            self.preview_pending = None
+            self.preview_state = state
+            self.status_var.set("Live preview ready.")
+            self.update_preview()
+
+        def on_error(e):
+            # Clear it so the next slider move retries (e.g. after the file is fixed on disk)
+            self.preview_pending = None
+            self.status_var.set(f"Live preview failed: {e}")
+
+        def on_cancel():
+            self.preview_pending = None
+            self.status_var.set("Live preview cancelled.")
+
+        self.jobs.submit("Live preview", work, on_done, on_error, on_cancel)
+
+    def update_preview(self):
+        """Re-embed at the current alpha from the cached transform and show the result"""
+        self.preview_after = None
+        key = self.preview_key()
+        if key is None:
+            return
+        state = self.preview_state
+        if state is None or state["key"] != key:
+            self.prepare_preview(key)
+            return
+
+        try:
             alpha = self.alpha_var.get()
+            watermarked_img = embed_prepared(state["coeffs"], state["LL_dct"], state["watermark"], state["model"], alpha)
+        except Exception as e:
+            self.status_var.set(f"Live preview failed: {e}")
+            return
 
-            # Embed watermark
-            watermarked_img = embed_watermark_dwtdct(original_img, watermark, model, level, alpha)
+        # Identical to a full embed at this alpha, so it becomes the current result
+        self.cover_img, self.watermarked_img = state["cover"], watermarked_img
+        self.show_image(watermarked_img, self.watermarked_img_label, "watermarked")
 
-            # Save and display result
-            self.watermarked_img_path = "watermarked_image.jpg"
-            cv2.imwrite(self.watermarked_img_path, watermarked_img)
+        if self.psnr_after is not None:
+            self.after_cancel(self.psnr_after)
+        self.psnr_after = self.after(PSNR_DELAY_MS, self.update_psnr)
 
-            img = Image.open(self.watermarked_img_path).resize((250, 250), Image.Resampling.LANCZOS)
-            self.image_references["watermarked"] = ImageTk.PhotoImage(img)
-            self.watermarked_img_label.configure(image=self.image_references["watermarked"])
+    def update_psnr(self):
+        self.psnr_after = None
+        if self.cover_img is not None and self.watermarked_img is not None:
+            self.psnr_var.set(f"PSNR: {cv2.PSNR(self.cover_img, self.watermarked_img):.2f} dB")
 
-            self.status_var.set("Watermark embedded successfully.")
-            messagebox.showinfo("Success", "Watermark embedded successfully and saved as 'watermarked_image.jpg'")
+    def auto_alpha(self):
+        """Set alpha from the PSNR floor and/or the NC floor under the chosen attack (see search_alpha)"""
+        if not self.original_img_path or not self.watermark_img_path:
+            messagebox.showwarning("Warning", "Please select both original and watermark images.")
+            return
+
+        try:
+            model, level, _ = self.get_parameters()
+            target_psnr = float(self.target_psnr_var.get()) if self.target_psnr_var.get().strip() else None
+            target_nc = float(self.target_nc_var.get()) if self.target_nc_var.get().strip() else None
+            attack = None if self.attack_var.get() == "none" else self.attack_var.get()
+            if target_psnr is None and target_nc is None:
+                raise ValueError("Enter a target PSNR and/or a minimum NC.")
+            if attack is not None and target_nc is None:
+                raise ValueError("An attack only applies to a minimum NC; enter one or choose 'none'.")
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to embed watermark:\n{str(e)}")
-            self.status_var.set("Watermark embedding failed.")
+            messagebox.showerror("Error", f"Alpha search failed:\n{str(e)}")
+            return
+
+        targets = []
+        if target_psnr is not None:
+            targets.append(f"PSNR >= {target_psnr:.1f} dB")
+        if target_nc is not None:
+            targets.append(f"NC >= {target_nc:.2f}" + (f" after {attack}" if attack else ""))
+        description = ", ".join(targets)
+
+        original_img_path = self.original_img_path
+        watermark_img_path = self.watermark_img_path
+
+        def work(job):
+            with Trace("auto-alpha") as trace:
+                job.progress("Searching alpha: reading images...")
+                original_img = convert_image(original_img_path, 512)
+                watermark = convert_image(watermark_img_path, 128)
+
+                job.progress(f"Searching alpha for {description}...")
+                alpha = search_alpha(
+                    original_img, watermark, model, level, min_psnr=target_psnr, min_nc=target_nc, attack=attack
+                )
+            return alpha, trace
+
+        def on_done(result):
+            alpha, trace = result
+            if alpha is None:
+                messagebox.showwarning("Auto Alpha", f"No alpha in [0, 1] meets {description}.")
+                self.status_var.set(f"Alpha search found no suitable value. [{trace.summary()}]")
+                return
+            self.alpha_var.set(round(alpha, 4))
+            self.status_var.set(f"Alpha set to {alpha:.4f} ({description}). [{trace.summary()}]")
+
+        self.run_job("Alpha search", work, on_done, "Alpha search failed", "Alpha search failed.")
 
     def save_watermarked(self):
-        if not self.watermarked_img_path:
+        if self.watermarked_img is None:
             messagebox.showwarning("Warning", "No watermarked image to save. Please embed watermark first.")
             return
 
         try:
-            file_path = filedialog.asksaveasfilename(
-                defaultextension=".jpg",
-                filetypes=[("JPEG files", "*.jpg"), ("PNG files", "*.png"), ("All files", "*.*")],
-                initialfile="watermarked_image.jpg"
-            )
+            file_path, fmt = self.ask_save_path("watermarked_image")
             if file_path:
-                img = Image.open(self.watermarked_img_path)
-                img.save(file_path)
-                self.status_var.set(f"Watermarked image saved as: {os.path.basename(file_path)}")
+                with Trace("save") as trace:
+                    save_image(file_path, self.watermarked_img, fmt, self.quality_var.get())
+                self.status_var.set(
+                    f"Watermarked image saved as: {os.path.basename(file_path)} ({fmt}) [{trace.summary()}]"
+                )
                 messagebox.showinfo("Success", f"Watermarked image saved successfully to:\n{file_path}")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save watermarked image:\n{str(e)}")
@@ -217,49 +479,38 @@ class WatermarkApp(customtkinter.CTk):
 
     def extract_from_app(self):
         """Extract watermark from the image created by this app"""
-        if not self.watermarked_img_path:
+        if self.watermarked_img is None:
             messagebox.showwarning("Warning", "No watermarked image available. Please embed watermark first.")
             return
 
         try:
-            self.status_var.set("Extracting watermark from app image...")
-            self.update()
-
-            # Get parameters
-            model = self.wavelet_var.get()
-            level = int(self.level_var.get())
-            alpha = self.alpha_var.get()
-
-            # Read watermarked image
-            watermarked_img = convert_image(self.watermarked_img_path, 512)
+            model, level, alpha = self.get_parameters()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to extract watermark:\n{str(e)}")
+            return
 
-            # Read original image if available
-            original_img = None
-            if self.original_img_path:
-                try:
-                    original_img = convert_image(self.original_img_path, 512)
-                except Exception:
-                    original_img = None
+        watermarked_img = self.watermarked_img
+        original_img_path = self.original_img_path
 
-            # Extract watermark
-            extracted_watermark = extract_watermark_dwtdct(watermarked_img, original_img, model, level, alpha)
-            extracted_watermark_clipped = np.clip(extracted_watermark, 0, 255).astype(np.uint8)
+        def work(job):
+            with Trace("extract") as trace:
+                job.progress("Extracting watermark from app image: reading original...")
+                original_LL_dct = load_original_coefficients(original_img_path, model, level)
 
-            # Save extracted watermark
-            self.extracted_img_path = "extracted_watermark.jpg"
-            Image.fromarray(extracted_watermark_clipped).save(self.extracted_img_path)
+                job.progress("Extracting watermark from app image: DWT-DCT transform...")
+                extracted_watermark = extract_watermark_dwtdct(watermarked_img, None, model, level, alpha, original_LL_dct)
+                extracted_watermark_clipped = np.clip(extracted_watermark, 0, 255).astype(np.uint8)
+            return extracted_watermark_clipped, original_LL_dct is not None, trace
 
-            # Display result
-            watermark_img_display = Image.fromarray(extracted_watermark_clipped).resize((250, 250), Image.Resampling.LANCZOS)
-            self.image_references["extracted"] = ImageTk.PhotoImage(watermark_img_display)
-            self.watermark_img_label.configure(image=self.image_references["extracted"])
+        def on_done(result):
+            self.extracted_img, non_blind, trace = result
+            self.show_image(self.extracted_img, self.watermark_img_label, "extracted")
 
-            extraction_type = "Non-blind" if original_img is not None else "Blind"
-            self.status_var.set(f"{extraction_type} watermark extracted from app image.")
+            extraction_type = "Non-blind" if non_blind else "Blind"
+            self.status_var.set(f"{extraction_type} watermark extracted from app image. [{trace.summary()}]")
             messagebox.showinfo("Success", f"{extraction_type} watermark extracted successfully from application image.")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to extract watermark:\n{str(e)}")
-            self.status_var.set("Extraction failed.")
+
+        self.run_job("Extraction", work, on_done, "Failed to extract watermark", "Extraction failed.")
 
     def extract_from_other(self):
         """Extract watermark from any uploaded image"""
@@ -270,138 +521,102 @@ class WatermarkApp(customtkinter.CTk):
         
         if not file_path:
             return
-            
-        try:
-            self.status_var.set("Extracting watermark from selected image...")
-            self.update()
 
-            # Get parameters
-            model = self.wavelet_var.get()
-            level = int(self.level_var.get())
-            alpha = self.alpha_var.get()
-
-            # Read watermarked image
-            watermarked_img = convert_image(file_path, 512)
+        try:
+            model, level, alpha = self.get_parameters()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to extract watermark:\n{str(e)}")
+            return
 
-            # Read original image if available
-            original_img = None
-            if self.original_img_path:
-                try:
-                    original_img = convert_image(self.original_img_path, 512)
-                except Exception:
-                    original_img = None
+        original_img_path = self.original_img_path
 
-            # Extract watermark
-            extracted_watermark = extract_watermark_dwtdct(watermarked_img, original_img, model, level, alpha)
-            extracted_watermark_clipped = np.clip(extracted_watermark, 0, 255).astype(np.uint8)
+        def work(job):
+            with Trace("extract") as trace:
+                job.progress("Extracting watermark from selected image: reading images...")
+                watermarked_img = convert_image(file_path, 512)
+                original_LL_dct = load_original_coefficients(original_img_path, model, level)
 
-            # Save extracted watermark
-            self.extracted_img_path = "extracted_watermark_from_upload.jpg"
-            Image.fromarray(extracted_watermark_clipped).save(self.extracted_img_path)
+                job.progress("Extracting watermark from selected image: DWT-DCT transform...")
+                extracted_watermark = extract_watermark_dwtdct(watermarked_img, None, model, level, alpha, original_LL_dct)
+                extracted_watermark_clipped = np.clip(extracted_watermark, 0, 255).astype(np.uint8)
+            return extracted_watermark_clipped, original_LL_dct is not None, trace
 
-            # Display result
-            watermark_img_display = Image.fromarray(extracted_watermark_clipped).resize((250, 250), Image.Resampling.LANCZOS)
-            self.image_references["extracted"] = ImageTk.PhotoImage(watermark_img_display)
-            self.watermark_img_label.configure(image=self.image_references["extracted"])
+        def on_done(result):
+            self.extracted_img, non_blind, trace = result
+            self.show_image(self.extracted_img, self.watermark_img_label, "extracted")
 
-            extraction_type = "Non-blind" if original_img is not None else "Blind"
-            self.status_var.set(f"{extraction_type} watermark extracted from uploaded image.")
+            extraction_type = "Non-blind" if non_blind else "Blind"
+            self.status_var.set(f"{extraction_type} watermark extracted from uploaded image. [{trace.summary()}]")
             messagebox.showinfo("Success", f"{extraction_type} watermark extracted successfully from:\n{os.path.basename(file_path)}")
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to extract watermark:\n{str(e)}")
-            self.status_var.set("Extraction failed.")
+
+        self.run_job("Extraction", work, on_done, "Failed to extract watermark", "Extraction failed.")
 
     def save_extracted(self):
-        if not self.extracted_img_path:
+        if self.extracted_img is None:
             messagebox.showwarning("Warning", "No extracted watermark to save. Please extract watermark first.")
             return
 
         try:
-            file_path = filedialog.asksaveasfilename(
-                defaultextension=".jpg",
-                filetypes=[("JPEG files", "*.jpg"), ("PNG files", "*.png"), ("All files", "*.*")],
-                initialfile="extracted_watermark.jpg"
-            )
+            file_path, fmt = self.ask_save_path("extracted_watermark")
             if file_path:
-                img = Image.open(self.extracted_img_path)
-                img.save(file_path)
-                self.status_var.set(f"Extracted watermark saved as: {os.path.basename(file_path)}")
+                with Trace("save") as trace:
+                    save_image(file_path, self.extracted_img, fmt, self.quality_var.get())
+                self.status_var.set(
+                    f"Extracted watermark saved as: {os.path.basename(file_path)} ({fmt}) [{trace.summary()}]"
+                )
                 messagebox.showinfo("Success", f"Extracted watermark saved successfully to:\n{file_path}")
         except Exception as e:
             messagebox.showerror("Error", f"Failed to save extracted watermark:\n{str(e)}")
             self.status_var.set("Save failed.")
 
     def test_robustness(self):
-        if not self.watermarked_img_path:
+        if self.watermarked_img is None:
             messagebox.showwarning("Warning", "Please embed watermark first.")
             return
 
         try:
-            self.status_var.set("Testing robustness with noise...")
-            self.update()
+            model, level, alpha = self.get_parameters()
+        except Exception as e:
+            messagebox.showerror("Error", f"Robustness test failed:\n{str(e)}")
+            return
 
-            # Get parameters
-            model = self.wavelet_var.get()
-            level = int(self.level_var.get())
-            alpha = self.alpha_var.get()
+        watermarked_img = self.watermarked_img
+        original_img_path = self.original_img_path
+
+        def work(job):
+            with Trace("robustness") as trace:
+                job.progress("Testing robustness with noise: adding noise...")
+                with stage("noise", watermarked_img):
+                    noise = np.random.normal(0, 15, watermarked_img.shape).astype(np.float32)
+                    noisy_img = np.clip(watermarked_img.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+
+                original_LL_dct = load_original_coefficients(original_img_path, model, level)
+
+                job.progress("Testing robustness with noise: extracting watermark...")
+                extracted_watermark = extract_watermark_dwtdct(noisy_img, None, model, level, alpha, original_LL_dct)
+                extracted_watermark_clipped = np.clip(extracted_watermark, 0, 255).astype(np.uint8)
+            return extracted_watermark_clipped, original_LL_dct is not None, trace
+
+        def on_done(result):
+            self.extracted_img, non_blind, trace = result
+            self.show_image(self.extracted_img, self.watermark_img_label, "extracted_robust")
 
-            # Read and add noise to watermarked image
-            img = cv2.imread(self.watermarked_img_path, cv2.IMREAD_GRAYSCALE)
-            noise = np.random.normal(0, 15, img.shape).astype(np.float32)
-            noisy_img = np.clip(img.astype(np.float32) + noise, 0, 255).astype(np.uint8)
-            cv2.imwrite("image_noisy.jpg", noisy_img)
-
-            # Read original image if available
-            original_img = None
-            if self.original_img_path:
-                try:
-                    original_img = convert_image(self.original_img_path, 512)
-                except Exception:
-                    original_img = None
-
-            # Extract from noisy image
-            extracted_watermark = extract_watermark_dwtdct(noisy_img, original_img, model, level, alpha)
-            extracted_watermark_clipped = np.clip(extracted_watermark, 0, 255).astype(np.uint8)
-
-            # Save and display result
-            self.extracted_img_path = "watermark_after_noise.jpg"
-            Image.fromarray(extracted_watermark_clipped).save(self.extracted_img_path)
-
-            watermark_img_display = Image.fromarray(extracted_watermark_clipped).resize((250, 250), Image.Resampling.LANCZOS)
-            self.image_references["extracted_robust"] = ImageTk.PhotoImage(watermark_img_display)
-            self.watermark_img_label.configure(image=self.image_references["extracted_robust"])
-
-            extraction_type = "Non-blind" if original_img is not None else "Blind"
+            extraction_type = "Non-blind" if non_blind else "Blind"
+            self.status_var.set(f"Robustness test completed. [{trace.summary()}]")
             messagebox.showinfo("Robustness", f"{extraction_type} watermark extracted from noisy image.")
-            self.status_var.set("Robustness test completed.")
-        except Exception as e:
-            messagebox.showerror("Error", f"Robustness test failed:\n{str(e)}")
-            self.status_var.set("Robustness test failed.")
+
+        self.run_job("Robustness test", work, on_done, "Robustness test failed", "Robustness test failed.")
 
     def calculate_imperceptibility(self):
-        if not self.original_img_path or not self.watermarked_img_path:
-            messagebox.showwarning("Warning", "Please select the Original Image and embed/select the Watermarked Image first.")
+        if self.cover_img is None or self.watermarked_img is None:
+            messagebox.showwarning("Warning", "Please select the Original Image and embed the watermark first.")
             return
 
         try:
             self.status_var.set("Calculating PSNR...")
-            self.update()
 
-            # Load images
-            original_img = cv2.imread(self.original_img_path, cv2.IMREAD_GRAYSCALE)
-            watermarked_img = cv2.imread(self.watermarked_img_path, cv2.IMREAD_GRAYSCALE)
-
-            if original_img is None or watermarked_img is None:
-                messagebox.showerror("Error", "Could not load one or both images.")
-                self.status_var.set("Metric calculation failed.")
-                return
-
-            # Resize if necessary
-            if original_img.shape != watermarked_img.shape:
-                watermarked_img = cv2.resize(watermarked_img, (original_img.shape[1], original_img.shape[0]))
-
-            # Calculate PSNR
-            psnr = cv2.PSNR(original_img, watermarked_img)
+            # Compare the exact cover and result of the last embed, both held in memory
+            psnr = cv2.PSNR(self.cover_img, self.watermarked_img)
 
             # Show results
             metrics_text = f"PSNR: {psnr:.2f} dB"
@@ -416,81 +631,10 @@ class WatermarkApp(customtkinter.CTk):
             messagebox.showerror("Error", f"Failed to calculate metrics:\n{str(e)}")
             self.status_var.set("Metric calculation failed.")
 
-# Helper functions
-def convert_image(image_path, size):
-    """Convert image to grayscale and resize it"""
-    img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-    if img is None:
-        raise FileNotFoundError(f"Image not found or cannot be read: {image_path}")
-    return cv2.resize(img, (size, size))
-
-def apply_dct(image_array):
-    """Apply DCT to image"""
-    return dct(dct(image_array.T, norm='ortho').T, norm='ortho')
-
-def apply_idct(dct_array):
-    """Apply inverse DCT to array"""
-    return idct(idct(dct_array.T, norm='ortho').T, norm='ortho')
-
-def process_coefficients(image_array, model, level):
-    """Apply DWT to image and get coefficients"""
-    return pywt.wavedec2(data=image_array.astype(np.float32), wavelet=model, level=level)
-
-def embed_watermark_dwtdct(image_array, watermark, model, level, alpha=0.1):
-    """Embed watermark using DWT-DCT method"""
-    coeffs = process_coefficients(image_array, model, level)
-    LL = coeffs[0].copy()
-    LL_dct = apply_dct(LL)
-
-    watermark_float = watermark.astype(np.float32)
-    embed_row_start = LL_dct.shape[0] // 4
-    embed_col_start = LL_dct.shape[1] // 4
-    h_w, w_w = watermark_float.shape
-
-    for i in range(h_w):
-        for j in range(w_w):
-            LL_dct[embed_row_start + i, embed_col_start + j] = LL_dct[embed_row_start + i, embed_col_start + j] * (1.0 + alpha * watermark_float[i, j] / 255.0)
-
-    LL_watermarked = apply_idct(LL_dct)
-    coeffs_watermarked = list(coeffs)
-    coeffs_watermarked[0] = LL_watermarked
-
-    watermarked_img = pywt.waverec2(coeffs=coeffs_watermarked, wavelet=model)
-    return np.clip(watermarked_img, 0, 255).astype(np.uint8)
-
-def extract_watermark_dwtdct(watermarked_img, original_img, model, level, alpha):
-    """Extract watermark from watermarked image"""
-    w_coeffs = process_coefficients(watermarked_img, model, level)
-    w_LL_dct = apply_dct(w_coeffs[0])
-    
-    extracted_size = (w_LL_dct.shape[0] // 2, w_LL_dct.shape[1] // 2)
-    watermark = np.zeros(extracted_size, dtype=np.float32)
-    
-    extract_row_start = w_LL_dct.shape[0] // 4
-    extract_col_start = w_LL_dct.shape[1] // 4
-    h_ext, w_ext = extracted_size
-
-    if original_img is not None:
-        o_coeffs = process_coefficients(original_img, model, level)
-        o_LL_dct = apply_dct(o_coeffs[0])
-
-        for i in range(h_ext):
-            for j in range(w_ext):
-                w_coeff = w_LL_dct[extract_row_start + i, extract_col_start + j]
-                o_coeff = o_LL_dct[extract_row_start + i, extract_col_start + j]
-                
-                if abs(o_coeff) > 1e-6 and alpha != 0:
-                    watermark[i, j] = ((w_coeff / o_coeff) - 1.0) / alpha * 255.0
-                else:
-                    watermark[i, j] = 128.0
-    else:
-        mean_coeff = np.mean(w_LL_dct[extract_row_start:extract_row_start+h_ext, extract_col_start:extract_col_start+w_ext])
-        for i in range(h_ext):
-            for j in range(w_ext):
-                watermark[i, j] = (w_LL_dct[extract_row_start + i, extract_col_start + j] - mean_coeff) * 5.0 + 128.0
-
-    return watermark
-
 if __name__ == "__main__":
+    # --- Set default appearance mode and color theme ---
+    customtkinter.set_appearance_mode("System")
+    customtkinter.set_default_color_theme("blue")
+
     app = WatermarkApp()
-    app.mainloop()
\ No newline at end of file
+    app.mainloop()
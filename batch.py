@@ -0,0 +1,250 @@
+"""Headless batch embedding/extraction for WaveSecure.
+
+Runs the same DWT-DCT pipeline as the GUI over a directory or manifest of
+images, fanning the work out over a process pool. Example:
+
+    python batch.py embed photos/ --watermark logo.png --output out/
+    python batch.py extract out/ --original master.png --output marks/
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+
+import numpy as np
+
+from wavesecure.attacks import ATTACKS
+from wavesecure.core import (
+    OUTPUT_FORMATS, approximation_coefficients, collect_inputs, convert_image, embed_watermark_dwtdct, extract_watermark_dwtdct,
+    fit_watermark, image_cache, original_coefficients, save_image, search_alpha, watermark_shape
+)
+from wavesecure.instrument import JsonLinesLog, Profiler, Trace, merge_profiles
+from wavesecure.transforms import BACKENDS, set_backend
+
+# Per-process state, populated once by _init_worker so every task doesn't
+# have to pickle the watermark/original again.
+_worker_state = {}
+
+def output_paths(paths, output_dir, fmt):
+    """Map every input path to its output path under `output_dir`.
+
+    Outputs mirror the inputs' layout relative to their common directory,
+    with the codec's extension. Inputs that differ only in their extension
+    (img0.jpg and img0.png) keep it in the name (img0_jpg.png, img0_png.png).
+    Raises ValueError if two inputs would still share an output.
+    """
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in paths])
+    names = [os.path.splitext(os.path.relpath(os.path.abspath(path), root)) for path in paths]
+    stem_counts = Counter(os.path.normcase(stem) for stem, _ in names)
+
+    outputs = []
+    seen = {}
+    for path, (stem, ext) in zip(paths, names):
+        if stem_counts[os.path.normcase(stem)] > 1:
+            stem += "_" + ext.lstrip(".").lower()
+        output_path = os.path.join(output_dir, stem + OUTPUT_FORMATS[fmt])
+        key = os.path.normcase(output_path)
+        if key in seen:
+            raise ValueError(f"{seen[key]} and {path} would both be written to {output_path}")
+        seen[key] = path
+        outputs.append(output_path)
+    return outputs
+
+def _init_worker(mode, reference, model, level, alpha, fmt, quality, target=None, backend=None,
+                 trace=False, profile=None):
+    if backend:
+        set_backend(*backend)
+    # Each input is read exactly once, so don't hold on to decoded images
+    image_cache.max_bytes = 0
+    _worker_state.update(
+        mode=mode, reference=reference, model=model, level=level, alpha=alpha, fmt=fmt, quality=quality, target=target,
+        trace=trace, profiler=Profiler(profile) if profile else None,
+    )
+
+def _process_one(path, output_path):
+    """Run one embed/extract job; returns (path, output_path, seconds, error, alpha, trace)
+
+    `trace` is the per-stage timing record (see instrument.Trace) when
+    tracing is enabled, else None.
+    """
+    state = _worker_state
+    with state["profiler"] or nullcontext():
+        if not state["trace"]:
+            return _process(path, output_path, state) + (None,)
+        with Trace(state["mode"], path=path) as trace:
+            result = _process(path, output_path, state)
+    record = trace.as_dict()
+    record.update(output=result[1], error=result[3], alpha=result[4])
+    return result + (record,)
+
+def _process(path, output_path, state):
+    alpha = state["alpha"]
+    start = time.perf_counter()
+    try:
+        image = convert_image(path, 512)
+        if state["mode"] == "embed":
+            if state["target"]:
+                # Per-image search; the configured alpha is the upper bound
+                alpha = search_alpha(
+                    image, state["reference"], state["model"], state["level"],
+                    alpha_range=(0.0, state["alpha"]), **state["target"]
+                )
+                if alpha is None:
+                    raise ValueError(f"No alpha up to {state['alpha']} meets the target")
+            result = embed_watermark_dwtdct(image, state["reference"], state["model"], state["level"], alpha)
+        else:
+            extracted = extract_watermark_dwtdct(
+                image, None, state["model"], state["level"], state["alpha"], state["reference"]
+            )
+            result = np.clip(extracted, 0, 255).astype(np.uint8)
+
+        save_image(output_path, result, state["fmt"], state["quality"])
+        return path, output_path, time.perf_counter() - start, None, alpha
+    except Exception as e:
+        return path, None, time.perf_counter() - start, f"{type(e).__name__}: {e}", alpha
+
+def run_batch(mode, paths, reference, model, level, alpha, output_dir, workers=None, fmt="PNG", quality=95,
+              target=None, backend=None, metrics=None, profile=None):
+    """Process `paths` in a process pool and return a list of per-file results.
+
+    `target` holds `core.search_alpha` keyword arguments (min_psnr,
+    min_nc, attack, attack_param); when given, each cover gets its own
+    alpha, searched up to `alpha`. `backend` is a (name, workers, float32)
+    tuple passed to `transforms.set_backend` in every worker. With
+    `metrics` set, per-stage timings of every file are appended to that
+    JSON-lines file; with `profile` set, workers run under cProfile and the
+    merged stats are written there. Raises ValueError before any work
+    starts if two inputs map to the same output (see `output_paths`).
+    """
+    outputs = output_paths(paths, output_dir, fmt)
+    for directory in {os.path.dirname(output_path) for output_path in outputs}:
+        os.makedirs(directory, exist_ok=True)
+    results = []
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(mode, reference, model, level, alpha, fmt, quality, target, backend,
+                  metrics is not None, profile),
+    ) as pool, (JsonLinesLog(metrics) if metrics else nullcontext()) as log:
+        futures = [pool.submit(_process_one, path, output_path) for path, output_path in zip(paths, outputs)]
+        for future in as_completed(futures):
+            result = future.result()
+            if result[3]:
+                print(f"FAILED {result[0]}: {result[3]}", file=sys.stderr)
+            if result[5] is not None:
+                log.write(result[5])
+            results.append(result)
+    if profile:
+        merge_profiles(profile)
+    return results
+
+def write_alpha_report(results, path):
+    """Write the alpha chosen for every successfully embedded file as CSV"""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["input", "output", "alpha"])
+        for input_path, output_path, _, error, alpha, _ in sorted(results, key=lambda result: result[0]):
+            if not error:
+                writer.writerow([input_path, output_path, f"{alpha:.6f}"])
+
+def summarize(results, elapsed):
+    """Build the throughput summary printed at the end of a run"""
+    latencies = np.array([result[2] for result in results if not result[3]])
+    failed = sum(1 for result in results if result[3])
+    lines = [
+        f"Processed {len(results)} images in {elapsed:.2f} s "
+        f"({len(latencies)} ok, {failed} failed)",
+        f"Throughput: {len(latencies) / elapsed if elapsed > 0 else 0.0:.2f} images/sec",
+    ]
+    if len(latencies):
+        p50, p99 = np.percentile(latencies, [50, 99]) * 1000.0
+        lines.append(f"Latency: p50 {p50:.1f} ms, p99 {p99:.1f} ms")
+    return "\n".join(lines)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Batch DWT-DCT watermark embedding and extraction.")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    def add_common(sub):
+        sub.add_argument("input", help="Directory of images or a manifest file listing image paths")
+        sub.add_argument("--output", required=True, help="Directory to write results to")
+        sub.add_argument("--wavelet", default="haar", help="Wavelet model (default: haar)")
+        sub.add_argument("--level", type=int, default=1, help="Decomposition level (default: 1)")
+        sub.add_argument("--alpha", type=float, default=0.1, help="Embedding strength (default: 0.1)")
+        sub.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+        sub.add_argument("--format", default="PNG", choices=list(OUTPUT_FORMATS), help="Output codec (default: PNG)")
+        sub.add_argument("--quality", type=int, default=95, help="JPEG quality when --format JPEG (default: 95)")
+        sub.add_argument("--backend", default="scipy", choices=list(BACKENDS), help="DCT backend (default: scipy)")
+        sub.add_argument("--dct-workers", type=int, default=None, help="Threads per DCT for the scipy backend")
+        sub.add_argument("--float64", action="store_true", help="Transform in double instead of single precision")
+        sub.add_argument("--metrics", default=None, help="Append per-stage timings of every file to this JSON-lines file")
+        sub.add_argument("--profile", default=None, help="Run workers under cProfile and write merged stats here")
+
+    embed = subparsers.add_parser("embed", help="Embed a watermark into every input image")
+    add_common(embed)
+    embed.add_argument("--watermark", required=True, help="Watermark image")
+    embed.add_argument("--target-psnr", type=float, help="Search the strongest alpha (up to --alpha) keeping this PSNR")
+    embed.add_argument("--target-nc", type=float, help="Require at least this NC for the extracted watermark")
+    embed.add_argument("--attack", choices=list(ATTACKS), help="Attack applied before scoring --target-nc")
+    embed.add_argument("--attack-param", type=float,
+                       help="Parameter for --attack, e.g. JPEG quality (default: its mildest setting, e.g. quality 90)")
+
+    extract = subparsers.add_parser("extract", help="Extract the watermark from every input image")
+    add_common(extract)
+    extract.add_argument("--original", default=None, help="Original image for non-blind extraction")
+
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.mode == "embed":
+        if args.attack and args.target_nc is None:
+            parser.error("--attack requires --target-nc")
+        if args.attack_param is not None and not args.attack:
+            parser.error("--attack-param requires --attack")
+    backend = (args.backend, args.dct_workers, not args.float64)
+    set_backend(*backend)
+
+    target = None
+    if args.mode == "embed":
+        # Covers are worked on at 512x512: fit the watermark to that LL subband for the chosen wavelet/level
+        LL_shape = approximation_coefficients(np.zeros((512, 512), dtype=np.uint8), args.wavelet, args.level).shape
+        if min(watermark_shape(LL_shape)) < 1:
+            parser.error(f"--level {args.level} leaves no room for a watermark with wavelet {args.wavelet}")
+        reference = fit_watermark(convert_image(args.watermark, 128), LL_shape)
+        if args.target_psnr is not None or args.target_nc is not None:
+            target = dict(
+                min_psnr=args.target_psnr, min_nc=args.target_nc, attack=args.attack, attack_param=args.attack_param
+            )
+    else:
+        # Transform the original once up front; workers receive its LL DCT
+        reference = original_coefficients(args.original, args.wavelet, args.level) if args.original else None
+
+    paths = collect_inputs(args.input)
+    if not paths:
+        print(f"No images found in {args.input}", file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    try:
+        results = run_batch(
+            args.mode, paths, reference, args.wavelet, args.level, args.alpha, args.output, args.workers,
+            args.format, args.quality, target, backend, args.metrics, args.profile,
+        )
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(summarize(results, time.perf_counter() - start))
+    if target:
+        report_path = os.path.join(args.output, "alphas.csv")
+        write_alpha_report(results, report_path)
+        print(f"Chosen alphas written to {report_path}")
+    return 1 if any(result[3] for result in results) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
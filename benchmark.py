@@ -0,0 +1,244 @@
+"""Performance benchmarks for the core transform functions, with stored baselines.
+
+Times `convert_image`, `apply_dct`/`apply_idct`, `process_coefficients`,
+`approximation_coefficients`, `embed_watermark_dwtdct` and
+`extract_watermark_dwtdct` over a grid of image sizes, wavelets and
+decomposition levels. For every case it records the best and median
+per-call wall time over several samples, each a loop of enough calls to
+last --min-time, plus the peak traced memory and the number/size of
+blocks still allocated after one call (measured in a separate run under
+tracemalloc so tracing doesn't skew the timings). Results are saved as a
+JSON baseline together with the library versions, and later runs can be
+compared against it:
+
+    python benchmark.py --save baseline.json
+    python benchmark.py --compare baseline.json --threshold 0.25
+
+Comparison exits non-zero when any case is slower or uses more peak
+memory than the baseline by more than the given fractions, which makes it
+usable as a gate when upgrading PyWavelets, SciPy or OpenCV. A slowdown
+also has to exceed --min-delta in absolute terms, so jitter on
+sub-millisecond cases is not reported.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+import cv2
+import numpy as np
+import pywt
+import scipy
+
+from wavesecure.core import (
+    apply_dct, apply_idct, approximation_coefficients, convert_image, embed_watermark_dwtdct,
+    extract_watermark_dwtdct, image_cache, process_coefficients
+)
+from wavesecure.transforms import BACKENDS, get_backend, set_backend
+
+DEFAULT_SIZES = (256, 512, 1024)
+DEFAULT_WAVELETS = ("haar", "db1", "db2")
+DEFAULT_LEVELS = (1, 2, 3)
+
+def environment():
+    """Library versions and transform settings the numbers depend on"""
+    backend = get_backend()
+    return dict(
+        python=platform.python_version(), numpy=np.__version__, scipy=scipy.__version__,
+        pywt=pywt.__version__, opencv=cv2.__version__, machine=platform.machine(),
+        backend=backend.name, float32=backend.float32, workers=backend.workers,
+    )
+
+def _convert_uncached(path, size):
+    """`convert_image` with a cold image cache, so the decode is measured too"""
+    image_cache.clear()
+    return convert_image(path, size)
+
+def build_cases(sizes, wavelets, levels, workdir, seed=0):
+    """Return (name, params, func) benchmark cases with their inputs prepared up front"""
+    rng = np.random.default_rng(seed)
+    cases = []
+    for size in sizes:
+        # Smooth noise so the codecs and transforms see image-like data
+        cover = cv2.GaussianBlur(rng.integers(0, 256, (size, size), dtype=np.uint8), (0, 0), 3)
+        path = os.path.join(workdir, f"cover_{size}.png")
+        cv2.imwrite(path, cover)
+        spatial = cover.astype(get_backend().dtype)
+        spectrum = apply_dct(spatial)
+
+        cases.append((f"convert_image[{size}]", dict(size=size), lambda path=path: _convert_uncached(path, 512)))
+        cases.append((f"apply_dct[{size}]", dict(size=size), lambda a=spatial: apply_dct(a)))
+        cases.append((f"apply_idct[{size}]", dict(size=size), lambda a=spectrum: apply_idct(a)))
+
+        for model, level in itertools.product(wavelets, levels):
+            params = dict(size=size, wavelet=model, level=level)
+            LL = process_coefficients(cover, model, level)[0]
+            watermark = rng.integers(0, 256, (LL.shape[0] // 2, LL.shape[1] // 2), dtype=np.uint8)
+            watermarked = embed_watermark_dwtdct(cover, watermark, model, level)
+
+            suffix = f"[{size},{model},L{level}]"
+            cases.append((
+                f"process_coefficients{suffix}", params,
+                lambda cover=cover, model=model, level=level: process_coefficients(cover, model, level),
+            ))
+            cases.append((
+                f"approximation_coefficients{suffix}", params,
+                lambda cover=cover, model=model, level=level: approximation_coefficients(cover, model, level),
+            ))
+            cases.append((
+                f"embed_watermark_dwtdct{suffix}", params,
+                lambda cover=cover, watermark=watermark, model=model, level=level:
+                    embed_watermark_dwtdct(cover, watermark, model, level, 0.1),
+            ))
+            cases.append((
+                f"extract_watermark_dwtdct{suffix}", params,
+                lambda watermarked=watermarked, cover=cover, model=model, level=level:
+                    extract_watermark_dwtdct(watermarked, cover, model, level, 0.1),
+            ))
+    return cases
+
+def loop_count(timer, min_time):
+    """Smallest number of calls (1, 2, 5, 10, 20, ...) that takes at least `min_time`, as timeit's autorange"""
+    scale = 1
+    while True:
+        for loops in (scale, 2 * scale, 5 * scale):
+            if timer.timeit(loops) >= min_time:
+                return loops
+        scale *= 10
+
+def measure(func, repeat=7, warmup=1, min_time=0.05):
+    """Best/median per-call time over `repeat` samples, then peak memory and retained allocations of one traced call.
+
+    Each sample times a loop of calls lasting at least `min_time`, since
+    single sub-millisecond calls are too noisy to compare.
+    """
+    for _ in range(warmup):
+        func()
+    timer = timeit.Timer(func)
+    loops = loop_count(timer, min_time)
+    times = [sample / loops for sample in timer.repeat(repeat, loops)]
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        base, _ = tracemalloc.get_traced_memory()
+        result = func()
+        _, peak = tracemalloc.get_traced_memory()
+        retained = tracemalloc.take_snapshot().compare_to(before, "filename")
+        del result
+    finally:
+        tracemalloc.stop()
+
+    return dict(
+        best_seconds=min(times),
+        median_seconds=statistics.median(times),
+        loops=loops,
+        peak_bytes=peak - base,
+        allocations=sum(stat.count_diff for stat in retained if stat.count_diff > 0),
+        allocated_bytes=sum(stat.size_diff for stat in retained if stat.size_diff > 0),
+    )
+
+def run_benchmarks(sizes=DEFAULT_SIZES, wavelets=DEFAULT_WAVELETS, levels=DEFAULT_LEVELS, repeat=7,
+                   pattern=None, progress=None, min_time=0.05):
+    """Run every case (or those whose name contains `pattern`) and return a baseline dict"""
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, params, func in build_cases(sizes, wavelets, levels, workdir):
+            if pattern and pattern not in name:
+                continue
+            results[name] = dict(params, **measure(func, repeat, min_time=min_time))
+            if progress:
+                progress(name, results[name])
+    return dict(environment=environment(), results=results)
+
+def compare(baseline, current, threshold=0.25, memory_threshold=0.25, min_delta=0.0005):
+    """Regressions of `current` against `baseline` as (case, metric, old, new) tuples.
+
+    Time is compared on the best sample, which is the least noisy statistic,
+    and only counts as a regression when it is also `min_delta` seconds
+    slower. Cases missing from either side are ignored.
+    """
+    regressions = []
+    for name, new in current["results"].items():
+        old = baseline["results"].get(name)
+        if old is None:
+            continue
+        slower = new["best_seconds"] - old["best_seconds"]
+        if new["best_seconds"] > old["best_seconds"] * (1 + threshold) and slower > min_delta:
+            regressions.append((name, "best_seconds", old["best_seconds"], new["best_seconds"]))
+        if new["peak_bytes"] > old["peak_bytes"] * (1 + memory_threshold):
+            regressions.append((name, "peak_bytes", old["peak_bytes"], new["peak_bytes"]))
+    return regressions
+
+def format_row(name, result, baseline=None):
+    line = (
+        f"{name:<44}{result['best_seconds'] * 1000:>10.2f} ms{result['median_seconds'] * 1000:>10.2f} ms"
+        f"{result['peak_bytes'] / 2**20:>9.1f} MiB{result['allocations']:>8}"
+    )
+    old = baseline and baseline["results"].get(name)
+    if old:
+        line += f"  {result['best_seconds'] / old['best_seconds'] - 1:+7.1%}"
+    return line
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark the core DWT-DCT functions against a stored baseline.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="Square image sizes")
+    parser.add_argument("--wavelets", nargs="+", default=list(DEFAULT_WAVELETS), help="Wavelet models")
+    parser.add_argument("--levels", type=int, nargs="+", default=list(DEFAULT_LEVELS), help="Decomposition levels")
+    parser.add_argument("--repeat", type=int, default=7, help="Timed samples per case (default: 7)")
+    parser.add_argument("--min-time", type=float, default=0.05,
+                        help="Minimum seconds per sample; fast cases are looped (default: 0.05)")
+    parser.add_argument("--filter", default=None, help="Only run cases whose name contains this text")
+    parser.add_argument("--save", default=None, help="Write the results as a JSON baseline")
+    parser.add_argument("--compare", default=None, help="Baseline JSON to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="Allowed slowdown as a fraction of the baseline time (default: 0.25)")
+    parser.add_argument("--memory-threshold", type=float, default=0.25,
+                        help="Allowed growth of peak memory as a fraction (default: 0.25)")
+    parser.add_argument("--min-delta", type=float, default=0.5,
+                        help="Ignore slowdowns smaller than this many milliseconds per call (default: 0.5)")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=None, help="DCT backend (default: scipy)")
+    parser.add_argument("--float64", action="store_true", help="Run the transforms in double precision")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.backend or args.float64:
+        set_backend(args.backend or get_backend().name, float32=not args.float64)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["environment"] != environment():
+            print(f"Note: baseline environment differs: {baseline['environment']}", file=sys.stderr)
+
+    print(f"{'case':<44}{'best':>13}{'median':>13}{'peak':>13}{'allocs':>8}")
+    current = run_benchmarks(
+        args.sizes, args.wavelets, args.levels, args.repeat, args.filter,
+        lambda name, result: print(format_row(name, result, baseline), flush=True), args.min_time,
+    )
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f"Baseline written to {args.save}")
+
+    if baseline is None:
+        return 0
+    regressions = compare(baseline, current, args.threshold, args.memory_threshold, args.min_delta / 1000)
+    for name, metric, old, new in regressions:
+        print(f"REGRESSION {name}: {metric} {old:.6g} -> {new:.6g} ({new / old - 1:+.1%})", file=sys.stderr)
+    if not regressions:
+        print(f"No regressions beyond {args.threshold:.0%} time / {args.memory_threshold:.0%} memory")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""Robustness benchmark for the DWT-DCT watermarking scheme.
+
+Embeds a watermark with every combination of wavelet, level and alpha,
+applies a matrix of attacks to each result and scores the extracted
+watermark. Combinations run in parallel in a process pool. The attacks
+and metrics live in `wavesecure.attacks` and `wavesecure.metrics`. Example:
+
+    python robustness.py cover.png --watermark logo.png \\
+        --wavelets haar db2 --alphas 0.05 0.1 0.2 --jpeg 90 70 50 \\
+        --json report.json --csv report.csv
+"""
+import argparse
+import csv
+import itertools
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from wavesecure.attacks import ATTACKS, DEFAULT_ATTACKS
+from wavesecure.core import (
+    apply_dct, approximation_coefficients, convert_image, embed_watermark_dwtdct, extract_watermark_dwtdct_batch,
+    fit_watermark,
+)
+from wavesecure.metrics import bit_error_rate, normalized_correlation, psnr, ssim
+
+def evaluate(cover, watermark, model, level, alpha, attacks, blind=False, seed=0):
+    """Embed once with one parameter set and score every attack; returns a list of result rows
+
+    The watermark is resized to fit this (wavelet, level)'s LL subband, and
+    NC/BER are scored against that resized reference.
+    """
+    LL = approximation_coefficients(cover, model, level)
+    watermark = fit_watermark(watermark, LL.shape)
+    watermarked = embed_watermark_dwtdct(cover, watermark, model, level, alpha)
+    base = dict(
+        wavelet=model, level=level, alpha=alpha,
+        psnr=psnr(cover, watermarked), ssim=ssim(cover, watermarked),
+    )
+
+    cases = [("none", None, watermarked)]
+    for name, params in attacks.items():
+        for param in params:
+            cases.append((name, param, ATTACKS[name](watermarked, param, seed)))
+
+    # All attacked copies share the cover, so extract them as one stack
+    original_LL_dct = None if blind else apply_dct(LL)
+    stack = np.stack([attacked for _, _, attacked in cases])
+    extracted = extract_watermark_dwtdct_batch(stack, None, model, level, alpha, original_LL_dct)
+
+    rows = []
+    for (name, param, attacked), mark in zip(cases, extracted):
+        rows.append(dict(
+            base, attack=name, param=param,
+            attacked_psnr=psnr(watermarked, attacked),
+            nc=normalized_correlation(watermark, mark),
+            ber=bit_error_rate(watermark, mark),
+        ))
+    return rows
+
+def _evaluate_case(args):
+    cover_name, cover, watermark, model, level, alpha, attacks, blind, seed = args
+    try:
+        rows = evaluate(cover, watermark, model, level, alpha, attacks, blind, seed)
+    except Exception as e:
+        rows = [dict(wavelet=model, level=level, alpha=alpha, attack="error", param=None, error=f"{type(e).__name__}: {e}")]
+    return [dict(row, cover=cover_name) for row in rows]
+
+def run_benchmark(covers, watermark, wavelets, levels, alphas, attacks, blind=False, seed=0, workers=None):
+    """Score the full (cover x wavelet x level x alpha x attack) matrix in parallel.
+
+    `covers` maps a name to a 512x512 uint8 cover; the watermark is resized
+    per (wavelet, level) to fit the LL subband. Failed parameter sets
+    are reported as rows with attack "error" instead of aborting the run.
+    """
+    jobs = [
+        (name, cover, watermark, model, level, alpha, attacks, blind, seed)
+        for (name, cover), model, level, alpha in itertools.product(covers.items(), wavelets, levels, alphas)
+    ]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return [row for rows in pool.map(_evaluate_case, jobs) for row in rows]
+
+COLUMNS = ["cover", "wavelet", "level", "alpha", "attack", "param", "psnr", "ssim", "attacked_psnr", "nc", "ber", "error"]
+
+def write_csv(rows, path):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def write_json(rows, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(rows, f, indent=2)
+
+def format_table(rows):
+    lines = [f"{'wavelet':<8}{'lvl':>4}{'alpha':>7}  {'attack':<8}{'param':>7}{'PSNR':>8}{'SSIM':>7}{'NC':>7}{'BER':>7}"]
+    for row in rows:
+        if row["attack"] == "error":
+            lines.append(f"{row['wavelet']:<8}{row['level']:>4}{row['alpha']:>7}  error: {row['error']}")
+            continue
+        param = "" if row["param"] is None else f"{row['param']:g}"
+        lines.append(
+            f"{row['wavelet']:<8}{row['level']:>4}{row['alpha']:>7g}  {row['attack']:<8}{param:>7}"
+            f"{row['psnr']:>8.2f}{row['ssim']:>7.3f}{row['nc']:>7.3f}{row['ber']:>7.3f}"
+        )
+    return "\n".join(lines)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Robustness benchmark for DWT-DCT watermarking.")
+    parser.add_argument("covers", nargs="+", help="Cover image(s)")
+    parser.add_argument("--watermark", required=True, help="Watermark image")
+    parser.add_argument("--wavelets", nargs="+", default=["haar"], help="Wavelet models (default: haar)")
+    parser.add_argument("--levels", nargs="+", type=int, default=[1], help="Decomposition levels (default: 1)")
+    parser.add_argument("--alphas", nargs="+", type=float, default=[0.1], help="Embedding strengths (default: 0.1)")
+    for name, params in DEFAULT_ATTACKS.items():
+        parser.add_argument(
+            f"--{name}", nargs="*", type=float, default=params,
+            help=f"{ATTACKS[name].__doc__} (default: {' '.join(map(str, params))}; pass no values to skip)",
+        )
+    parser.add_argument("--blind", action="store_true", help="Score blind extraction instead of non-blind")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for random attacks (default: 0)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--json", help="Write results as JSON to this path")
+    parser.add_argument("--csv", help="Write results as CSV to this path")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    covers = {path: convert_image(path, 512) for path in args.covers}
+    watermark = convert_image(args.watermark, 128)
+    attacks = {name: getattr(args, name) for name in ATTACKS if getattr(args, name)}
+
+    rows = run_benchmark(
+        covers, watermark, args.wavelets, args.levels, args.alphas, attacks, args.blind, args.seed, args.workers
+    )
+    print(format_table(rows))
+    if args.json:
+        write_json(rows, args.json)
+    if args.csv:
+        write_csv(rows, args.csv)
+    return 1 if any(row["attack"] == "error" for row in rows) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,358 @@
+"""Local HTTP service for DWT-DCT embedding and extraction.
+
+An asyncio server accepts concurrent requests and hands the CPU work to a
+process pool that is started and warmed up (imports, transform plans)
+before the first request. Watermarks and originals are referenced by path
+on the local filesystem; their decoded arrays and the originals' LL DCT
+are kept resident in a byte-bounded cache, keyed on file content, so
+repeated requests skip that work. Requests beyond --max-pending are
+rejected with 503 and a Retry-After header instead of queueing without
+bound.
+
+    python service.py --port 8350 --workers 4
+    curl --data-binary @photo.jpg -o marked.png \\
+        "http://127.0.0.1:8350/embed?watermark=/srv/logo.png&alpha=0.1"
+    curl --data-binary @marked.png -o mark.png \\
+        "http://127.0.0.1:8350/extract?original=/srv/photo.jpg"
+    curl http://127.0.0.1:8350/metrics
+
+Endpoints:
+    POST /embed     body: cover image; query: watermark, wavelet, level, alpha, format, quality
+    POST /extract   body: suspect image; query: original (optional), wavelet, level, alpha
+    GET  /metrics   latency percentiles, queue depth and cache statistics as JSON
+    GET  /health    "ok" once the pool is warm
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from wavesecure.cache import CoefficientCache, file_digest
+from wavesecure.core import (
+    OUTPUT_FORMATS, apply_dct, approximation_coefficients, convert_image, decode_image, embed_watermark_dwtdct,
+    encode_image, extract_watermark_dwtdct
+)
+from wavesecure.transforms import BACKENDS, get_backend, set_backend
+
+MAX_BODY_BYTES = 64 * 1024 * 1024
+REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable",
+}
+
+class HTTPError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+# --- Worker side (runs in the process pool) ---
+
+def _init_worker(backend):
+    if backend:
+        set_backend(*backend)
+
+def _warm_up():
+    """Load the codecs and transforms and run one small embed so the first request pays nothing extra"""
+    cover = np.zeros((64, 64), dtype=np.uint8)
+    embed_watermark_dwtdct(cover, np.zeros((16, 16), dtype=np.uint8), "haar", 1)
+    encode_image(cover)
+    return os.getpid()
+
+def _load_watermark(path, size):
+    return convert_image(path, size)
+
+def _load_original(path, model, level, size):
+    return apply_dct(approximation_coefficients(convert_image(path, size), model, level))
+
+def _embed(data, watermark, model, level, alpha, fmt, quality, size):
+    cover = decode_image(data, size)
+    return encode_image(embed_watermark_dwtdct(cover, watermark, model, level, alpha), fmt, quality)
+
+def _extract(data, original_LL_dct, model, level, alpha, size):
+    suspect = decode_image(data, size)
+    extracted = extract_watermark_dwtdct(suspect, None, model, level, alpha, original_LL_dct)
+    return encode_image(np.clip(extracted, 0, 255).astype(np.uint8))
+
+# --- Server side ---
+
+class Metrics:
+    """Request counters and a sliding window of latencies per endpoint"""
+
+    def __init__(self, window=2048):
+        self.window = window
+        self.started = time.time()
+        self.requests = Counter()
+        self.errors = Counter()
+        self.rejected = 0
+        self.latencies = {}
+
+    def observe(self, endpoint, seconds, ok):
+        self.requests[endpoint] += 1
+        if not ok:
+            self.errors[endpoint] += 1
+        self.latencies.setdefault(endpoint, deque(maxlen=self.window)).append(seconds)
+
+    def snapshot(self):
+        latency = {}
+        for endpoint, samples in self.latencies.items():
+            p50, p90, p99 = np.percentile(np.fromiter(samples, dtype=np.float64), [50, 90, 99]) * 1000.0
+            latency[endpoint] = dict(p50_ms=p50, p90_ms=p90, p99_ms=p99, samples=len(samples))
+        return dict(
+            uptime_seconds=time.time() - self.started, requests=dict(self.requests), errors=dict(self.errors),
+            rejected=self.rejected, latency=latency,
+        )
+
+class WatermarkService:
+    """Request handling, resident reference cache and admission control around a warm process pool"""
+
+    def __init__(self, workers=None, max_pending=64, cache_bytes=256 * 1024 * 1024, backend=None,
+                 cover_size=512, watermark_size=128, spill_dir=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.backend = backend
+        self.cover_size = cover_size
+        self.watermark_size = watermark_size
+        self.cache = CoefficientCache(cache_bytes, spill_dir)
+        self.metrics = Metrics()
+        self.pending = 0
+        self.max_seen_pending = 0
+        self.ready = False
+        self._loading = {}
+        self.pool = None
+
+    async def start(self):
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker, initargs=(self.backend,))
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self.pool, _warm_up) for _ in range(self.workers)))
+        self.ready = True
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+        self.cache.clear()
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.pool, func, *args)
+
+    async def _resident(self, key, load):
+        """Cached array for `key`, loading it in the pool once even under concurrent requests"""
+        value = self.cache.get(key)
+        if value is not None:
+            return value
+        task = self._loading.get(key)
+        if task is None:
+            task = self._loading[key] = asyncio.ensure_future(load())
+            task.add_done_callback(lambda _: self._loading.pop(key, None))
+        value = await task
+        self.cache.put(key, value)
+        return value
+
+    async def _digest(self, path):
+        if not os.path.isfile(path):
+            raise HTTPError(404, f"No such file: {path}")
+        return await asyncio.get_running_loop().run_in_executor(None, file_digest, path)
+
+    async def watermark(self, path):
+        try:
+            key = ("watermark", await self._digest(path), self.watermark_size)
+            return await self._resident(key, lambda: self._run(_load_watermark, path, self.watermark_size))
+        except OSError as e:
+            raise HTTPError(400, f"Cannot read watermark: {e}") from None
+
+    async def original(self, path, model, level):
+        try:
+            key = (
+                "original", await self._digest(path), self.cover_size, model, level, np.dtype(get_backend().dtype).name
+            )
+            return await self._resident(key, lambda: self._run(_load_original, path, model, level, self.cover_size))
+        except OSError as e:
+            raise HTTPError(400, f"Cannot read original: {e}") from None
+
+    async def dispatch(self, method, target, body):
+        """Route one request; returns (status, content_type, payload)"""
+        url = urlsplit(target)
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+
+        if url.path == "/health":
+            return (200 if self.ready else 503), "text/plain", b"ok" if self.ready else b"warming up"
+        if url.path == "/metrics":
+            metrics = self.metrics.snapshot()
+            metrics.update(
+                pending=self.pending, max_pending_seen=self.max_seen_pending, max_pending=self.max_pending,
+                workers=self.workers, queued=max(0, self.pending - self.workers),
+                cache=dict(entries=len(self.cache), bytes=self.cache.nbytes, hits=self.cache.hits,
+                           misses=self.cache.misses),
+            )
+            return 200, "application/json", json.dumps(metrics, indent=2).encode("utf-8")
+        if url.path not in ("/embed", "/extract"):
+            raise HTTPError(404, f"Unknown endpoint {url.path}")
+        if method != "POST":
+            raise HTTPError(405, f"{url.path} expects POST", {"Allow": "POST"})
+        if not body:
+            raise HTTPError(400, "Request body must contain an image")
+
+        # Admission control: shed load instead of letting the queue grow without bound
+        if self.pending >= self.max_pending:
+            self.metrics.rejected += 1
+            raise HTTPError(503, "Too many pending requests", {"Retry-After": "1"})
+        self.pending += 1
+        self.max_seen_pending = max(self.max_seen_pending, self.pending)
+        try:
+            return await self._watermark_request(url.path, query, body)
+        finally:
+            self.pending -= 1
+
+    async def _watermark_request(self, path, query, body):
+        try:
+            model = query.get("wavelet", "haar")
+            level = int(query.get("level", 1))
+            alpha = float(query.get("alpha", 0.1))
+        except ValueError as e:
+            raise HTTPError(400, f"Bad parameter: {e}") from None
+
+        if path == "/embed":
+            if "watermark" not in query:
+                raise HTTPError(400, "Missing 'watermark' parameter")
+            fmt = query.get("format", "PNG").upper()
+            if fmt not in OUTPUT_FORMATS:
+                raise HTTPError(400, f"Unknown format {fmt}; choose from {', '.join(OUTPUT_FORMATS)}")
+            watermark = await self.watermark(query["watermark"])
+            payload = await self._run(
+                _embed, body, watermark, model, level, alpha, fmt, int(query.get("quality", 95)), self.cover_size
+            )
+            return 200, f"image/{fmt.lower()}", payload
+
+        original = await self.original(query["original"], model, level) if "original" in query else None
+        payload = await self._run(_extract, body, original, model, level, alpha, self.cover_size)
+        return 200, "image/png", payload
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request = await _read_request(reader)
+                if request is None:
+                    break
+                method, target, headers, body = request
+                start = time.perf_counter()
+                extra = {}
+                try:
+                    status, content_type, payload = await self.dispatch(method, target, body)
+                except HTTPError as e:
+                    status, content_type, payload, extra = e.status, "text/plain", str(e).encode("utf-8"), e.headers
+                except Exception as e:
+                    # ValueErrors come from unreadable images or parameters that don't fit
+                    status = 400 if isinstance(e, ValueError) else 500
+                    content_type, payload = "text/plain", f"{type(e).__name__}: {e}".encode("utf-8")
+                endpoint = urlsplit(target).path
+                if endpoint in ("/embed", "/extract") and status != 503:
+                    self.metrics.observe(endpoint, time.perf_counter() - start, status == 200)
+
+                keep_alive = headers.get("connection", "").lower() != "close"
+                _write_response(writer, status, content_type, payload, keep_alive, extra)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except HTTPError as e:
+            _write_response(writer, e.status, "text/plain", str(e).encode("utf-8"), False, e.headers)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+async def _readline(reader):
+    try:
+        return await reader.readline()
+    except ValueError:
+        # StreamReader's line limit was exceeded
+        raise HTTPError(400, "Request line or header too long") from None
+
+async def _read_request(reader):
+    """Parse one HTTP/1.1 request; returns (method, target, headers, body) or None at end of stream"""
+    line = await _readline(reader)
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split()
+    except ValueError:
+        raise HTTPError(400, "Malformed request line") from None
+
+    headers = {}
+    while True:
+        line = await _readline(reader)
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    length = headers.get("content-length", "") or "0"
+    if not (length.isascii() and length.isdigit()):
+        raise HTTPError(400, f"Invalid Content-Length: {length!r}")
+    length = int(length)
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413, f"Body larger than {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target, headers, body
+
+def _write_response(writer, status, content_type, payload, keep_alive, headers=None):
+    lines = [
+        f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+        f"Content-Type: {content_type}",
+        f"Content-Length: {len(payload)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + payload)
+
+async def serve(service, host="127.0.0.1", port=8350, unix_socket=None):
+    await service.start()
+    if unix_socket:
+        server = await asyncio.start_unix_server(service.handle_connection, path=unix_socket)
+        where = unix_socket
+    else:
+        server = await asyncio.start_server(service.handle_connection, host, port)
+        where = f"http://{host}:{port}"
+    print(f"Serving on {where} with {service.workers} warm workers", file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Local HTTP service for DWT-DCT watermarking.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to bind (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8350, help="Port to bind (default: 8350)")
+    parser.add_argument("--unix", default=None, help="Listen on this Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--max-pending", type=int, default=64,
+                        help="Requests allowed in flight before answering 503 (default: 64)")
+    parser.add_argument("--cache-mb", type=int, default=256, help="Memory for resident watermarks/originals (default: 256)")
+    parser.add_argument("--spill-dir", default=None,
+                        help="Write references evicted from memory here and reload them from disk (removed on exit)")
+    parser.add_argument("--backend", default="scipy", choices=list(BACKENDS), help="DCT backend (default: scipy)")
+    parser.add_argument("--float64", action="store_true", help="Transform in double instead of single precision")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    backend = (args.backend, None, not args.float64)
+    set_backend(*backend)
+    service = WatermarkService(
+        args.workers, args.max_pending, args.cache_mb * 1024 * 1024, backend, spill_dir=args.spill_dir
+    )
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
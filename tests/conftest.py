@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The repository has no package metadata; make `wavesecure` importable from a plain `pytest` run
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
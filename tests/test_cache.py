@@ -0,0 +1,90 @@
+"""LRU eviction, disk spill and file digests of the coefficient cache."""
+import os
+
+import numpy as np
+
+from wavesecure import cache
+from wavesecure.cache import CoefficientCache, file_digest
+
+def array(value, size=1024):
+    return np.full(size, value, dtype=np.uint8)
+
+def test_evicts_least_recently_used():
+    coefficients = CoefficientCache(max_bytes=3 * 1024)
+    for key in "abc":
+        coefficients.put(key, array(ord(key)))
+    coefficients.get("a")  # "b" is now the oldest
+    coefficients.put("d", array(0))
+
+    assert coefficients.get("b") is None
+    assert all(coefficients.get(key) is not None for key in "acd")
+    assert coefficients.nbytes == 3 * 1024
+
+def test_cached_arrays_are_read_only():
+    coefficients = CoefficientCache()
+    coefficients.put("a", array(1))
+    assert not coefficients.get("a").flags.writeable
+
+def test_spills_evicted_entries_and_reloads_them(tmp_path):
+    coefficients = CoefficientCache(max_bytes=1024, spill_dir=str(tmp_path))
+    coefficients.put("a", array(1))
+    coefficients.put("b", array(2))  # evicts "a" to disk
+    assert len(coefficients) == 1
+    assert len(os.listdir(tmp_path)) == 1
+
+    reloaded = coefficients.get("a")
+    np.testing.assert_array_equal(reloaded, array(1))
+    assert coefficients.hits == 1 and coefficients.misses == 0
+
+def test_clear_removes_spill_files(tmp_path):
+    coefficients = CoefficientCache(max_bytes=1024, spill_dir=str(tmp_path))
+    for value in range(4):
+        coefficients.put(value, array(value))
+    assert os.listdir(tmp_path)
+
+    coefficients.clear()
+    assert os.listdir(tmp_path) == []
+    assert len(coefficients) == 0 and coefficients.nbytes == 0
+    assert coefficients.get(0) is None
+
+def test_get_or_compute_computes_once():
+    coefficients = CoefficientCache()
+    calls = []
+    for _ in range(3):
+        coefficients.get_or_compute("a", lambda: calls.append(1) or array(1))
+    assert len(calls) == 1
+
+def test_file_digest_follows_content_and_stays_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "DIGEST_MEMO_SIZE", 4)
+    path = tmp_path / "a.bin"
+    path.write_bytes(b"one")
+    first = file_digest(str(path))
+    path.write_bytes(b"two!")
+    assert file_digest(str(path)) != first
+
+    for i in range(10):
+        other = tmp_path / f"{i}.bin"
+        other.write_bytes(bytes([i]))
+        file_digest(str(other))
+    assert len(cache._digest_memo) <= 4
+
+def test_image_cache_decodes_each_file_once(tmp_path, monkeypatch):
+    import cv2
+    from wavesecure.cache import ImageCache
+
+    path = str(tmp_path / "color.png")
+    rgb = np.random.default_rng(0).integers(0, 256, (64, 48, 3), dtype=np.uint8)
+    cv2.imwrite(path, cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR))
+
+    reads = []
+    imread = cv2.imread
+    monkeypatch.setattr(cv2, "imread", lambda *args: reads.append(args) or imread(*args))
+    images = ImageCache()
+    preview = images.preview(path, 32)
+    gray = images.resized(path, 32)
+    full = images.load(path)
+
+    assert len(reads) == 1
+    assert preview.shape == (32, 32, 3) and gray.shape == (32, 32)
+    np.testing.assert_array_equal(images.load(path, color=True), rgb)
+    np.testing.assert_array_equal(full, cv2.cvtColor(rgb, cv2.COLOR_RGB2GRAY))
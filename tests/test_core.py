@@ -0,0 +1,134 @@
+"""Pins the vectorized embed/extract against the original per-pixel implementation."""
+import numpy as np
+import pytest
+import pywt
+from scipy.fftpack import dct, idct
+
+from wavesecure.core import (
+    apply_dct, approximation_coefficients, embed_watermark_dwtdct, embed_watermark_dwtdct_batch,
+    extract_watermark_dwtdct, extract_watermark_dwtdct_batch, fit_watermark, original_coefficients,
+    process_coefficients, watermark_shape
+)
+
+CASES = [("haar", 1), ("haar", 3), ("db1", 2), ("db2", 1), ("db2", 3)]
+
+# --- Reference: the loop-based algorithm the GUI shipped with ---
+
+def reference_dct(array):
+    return dct(dct(array.T, norm='ortho').T, norm='ortho')
+
+def reference_idct(array):
+    return idct(idct(array.T, norm='ortho').T, norm='ortho')
+
+def reference_embed(image, watermark, model, level, alpha):
+    coeffs = pywt.wavedec2(image.astype(np.float32), model, level=level)
+    LL_dct = reference_dct(coeffs[0].copy())
+    row, col = LL_dct.shape[0] // 4, LL_dct.shape[1] // 4
+    for i in range(watermark.shape[0]):
+        for j in range(watermark.shape[1]):
+            LL_dct[row + i, col + j] *= 1.0 + alpha * float(watermark[i, j]) / 255.0
+    coeffs = list(coeffs)
+    coeffs[0] = reference_idct(LL_dct)
+    return np.clip(pywt.waverec2(coeffs, model), 0, 255).astype(np.uint8)
+
+def reference_extract(image, original, model, level, alpha):
+    w_LL_dct = reference_dct(pywt.wavedec2(image.astype(np.float32), model, level=level)[0])
+    height, width = w_LL_dct.shape[0] // 2, w_LL_dct.shape[1] // 2
+    row, col = w_LL_dct.shape[0] // 4, w_LL_dct.shape[1] // 4
+    block = w_LL_dct[row:row + height, col:col + width]
+    if original is None:
+        return ((block - block.mean()) * 5.0 + 128.0).astype(np.float32)
+    o_LL_dct = reference_dct(pywt.wavedec2(original.astype(np.float32), model, level=level)[0])
+    o_block = o_LL_dct[row:row + height, col:col + width]
+    watermark = np.full((height, width), 128.0, dtype=np.float32)
+    for i in range(height):
+        for j in range(width):
+            if abs(o_block[i, j]) > 1e-6 and alpha != 0:
+                watermark[i, j] = ((block[i, j] / o_block[i, j]) - 1.0) / alpha * 255.0
+    return watermark
+
+# --- Fixtures ---
+
+def smooth_image(rng, size):
+    """Blurred noise, so the transforms see image-like data"""
+    import cv2
+    return cv2.GaussianBlur(rng.integers(0, 256, (size, size), dtype=np.uint8), (0, 0), 3)
+
+def watermark_for(cover, model, level, rng):
+    height, width = process_coefficients(cover, model, level)[0].shape
+    return rng.integers(0, 256, (height // 2, width // 2), dtype=np.uint8)
+
+@pytest.fixture(scope="module")
+def cover():
+    return smooth_image(np.random.default_rng(0), 256)
+
+# --- Tests ---
+
+@pytest.mark.parametrize("model, level", CASES)
+def test_embed_matches_reference(cover, model, level):
+    watermark = watermark_for(cover, model, level, np.random.default_rng(1))
+    marked = embed_watermark_dwtdct(cover, watermark, model, level, 0.1)
+    expected = reference_embed(cover, watermark, model, level, 0.1)
+    difference = np.abs(marked.astype(np.int16) - expected)
+    # float32 vs. the reference's mixed precision: at most an occasional 1-LSB rounding flip
+    assert difference.max() <= 1
+    assert np.mean(difference > 0) < 1e-3
+
+@pytest.mark.parametrize("model, level", CASES)
+def test_extract_matches_reference(cover, model, level):
+    watermark = watermark_for(cover, model, level, np.random.default_rng(2))
+    marked = reference_embed(cover, watermark, model, level, 0.1)
+
+    blind = extract_watermark_dwtdct(marked, None, model, level, 0.1)
+    np.testing.assert_allclose(blind, reference_extract(marked, None, model, level, 0.1), rtol=0, atol=0.01)
+
+    # The non-blind ratio is ill-conditioned where the original's coefficient is near zero,
+    # so a handful of pixels may differ by more than rounding
+    extracted = np.clip(extract_watermark_dwtdct(marked, cover, model, level, 0.1), 0, 255)
+    expected = np.clip(reference_extract(marked, cover, model, level, 0.1), 0, 255)
+    assert np.mean(np.abs(extracted - expected) > 1.5) < 5e-3
+
+@pytest.mark.parametrize("model, level", CASES)
+def test_cached_original_matches_original_image(cover, model, level, tmp_path):
+    import cv2
+    path = str(tmp_path / "original.png")
+    cv2.imwrite(path, cover)
+    watermark = watermark_for(cover, model, level, np.random.default_rng(3))
+    marked = embed_watermark_dwtdct(cover, watermark, model, level, 0.1)
+    from_image = extract_watermark_dwtdct(marked, cover, model, level, 0.1)
+    original_LL_dct = original_coefficients(path, model, level, size=cover.shape[0])
+    from_cache = extract_watermark_dwtdct(marked, None, model, level, 0.1, original_LL_dct)
+    np.testing.assert_array_equal(from_cache, from_image)
+
+@pytest.mark.parametrize("model, level", CASES)
+def test_batch_matches_single(model, level):
+    rng = np.random.default_rng(4)
+    covers = np.stack([smooth_image(rng, 256) for _ in range(3)])
+    watermarks = np.stack([watermark_for(covers[0], model, level, rng) for _ in range(3)])
+
+    marked = embed_watermark_dwtdct_batch(covers, watermarks, model, level, 0.1)
+    for cover, watermark, result in zip(covers, watermarks, marked):
+        np.testing.assert_array_equal(result, embed_watermark_dwtdct(cover, watermark, model, level, 0.1))
+
+    extracted = extract_watermark_dwtdct_batch(marked, covers, model, level, 0.1)
+    for image, original, result in zip(marked, covers, extracted):
+        expected = extract_watermark_dwtdct(image, original, model, level, 0.1)
+        np.testing.assert_allclose(result, expected, rtol=1e-5, atol=1e-3)
+
+@pytest.mark.parametrize("model, level", CASES)
+def test_approximation_matches_full_decomposition(cover, model, level):
+    """The LL-only fast path agrees with the LL band of the full wavedec2"""
+    LL = approximation_coefficients(cover, model, level)
+    expected = process_coefficients(cover, model, level)[0]
+    assert LL.shape == expected.shape and LL.dtype == expected.dtype
+    np.testing.assert_allclose(LL, expected, rtol=0, atol=1e-2 * 2 ** level)
+    np.testing.assert_allclose(apply_dct(LL), apply_dct(expected), rtol=0, atol=1e-2 * 2 ** level)
+
+@pytest.mark.parametrize("model, level", CASES)
+def test_fit_watermark_matches_extracted_shape(cover, model, level):
+    """A resized watermark fits every level and lines up with what extraction returns"""
+    LL = approximation_coefficients(cover, model, level)
+    watermark = fit_watermark(np.full((128, 128), 200, dtype=np.uint8), LL.shape)
+    assert watermark.shape == watermark_shape(LL.shape)
+    marked = embed_watermark_dwtdct(cover, watermark, model, level, 0.1)
+    assert extract_watermark_dwtdct(marked, cover, model, level, 0.1).shape == watermark.shape
@@ -0,0 +1,55 @@
+"""Watermark registry: append-only id index, reopening and identification."""
+import json
+import os
+
+import numpy as np
+import pytest
+
+from wavesecure.registry import IDS_FILE, INDEX_FILE, VECTORS_FILE, WatermarkRegistry
+
+@pytest.fixture
+def marks():
+    return np.random.default_rng(0).integers(0, 256, (6, 64, 64)).astype(np.float32)
+
+def test_ids_survive_reopening_and_growth(tmp_path, marks):
+    registry = WatermarkRegistry(str(tmp_path), initial_capacity=2)
+    for i, mark in enumerate(marks):
+        registry.add(f"id{i}", mark)
+
+    reopened = WatermarkRegistry(str(tmp_path))
+    assert reopened.ids == [f"id{i}" for i in range(6)]
+    assert reopened.identify(marks[4], k=1)[0]["id"] == "id4"
+    with pytest.raises(ValueError):
+        reopened.add("id0", marks[0])
+
+def test_index_file_holds_only_metadata(tmp_path, marks):
+    registry = WatermarkRegistry(str(tmp_path))
+    registry.add(["a", "b"], marks[:2])
+    with open(tmp_path / INDEX_FILE, encoding="utf-8") as f:
+        assert json.load(f) == dict(shape=[32, 32])
+    assert (tmp_path / IDS_FILE).read_text(encoding="utf-8") == '"a"\n"b"\n'
+
+def test_incomplete_last_id_is_dropped(tmp_path, marks):
+    registry = WatermarkRegistry(str(tmp_path))
+    registry.add(["a", "b"], marks[:2])
+    with open(tmp_path / IDS_FILE, "a", encoding="utf-8") as f:
+        f.write('"c')  # interrupted append
+
+    reopened = WatermarkRegistry(str(tmp_path))
+    assert reopened.ids == ["a", "b"]
+    reopened.add("c", marks[2])
+    assert WatermarkRegistry(str(tmp_path)).ids == ["a", "b", "c"]
+
+def test_migrates_ids_from_old_index(tmp_path, marks):
+    registry = WatermarkRegistry(str(tmp_path))
+    registry.add(["a", "b"], marks[:2])
+    del registry
+    os.remove(tmp_path / IDS_FILE)
+    with open(tmp_path / INDEX_FILE, "w", encoding="utf-8") as f:
+        json.dump(dict(shape=[32, 32], ids=["a", "b"]), f)
+
+    migrated = WatermarkRegistry(str(tmp_path))
+    assert migrated.ids == ["a", "b"]
+    assert "ids" not in json.loads((tmp_path / INDEX_FILE).read_text(encoding="utf-8"))
+    assert WatermarkRegistry(str(tmp_path)).identify(marks[1], k=1)[0]["id"] == "b"
+    assert os.path.exists(tmp_path / VECTORS_FILE)
@@ -0,0 +1,47 @@
+"""Tolerance tests for the DCT/DWT backends."""
+import numpy as np
+import pytest
+import pywt
+
+from wavesecure.transforms import BACKENDS, FftpackBackend, compare_backends
+
+TOLERANCE = 1e-2
+
+@pytest.fixture(scope="module")
+def data():
+    return np.random.default_rng(0).integers(0, 256, (3, 256, 256)).astype(np.float32)
+
+@pytest.mark.parametrize("float32", [True, False])
+@pytest.mark.parametrize("name", sorted(BACKENDS))
+def test_dct_matches_reference(name, float32, data):
+    backend = BACKENDS[name](float32=float32)
+    reference = FftpackBackend(float32=False).dct2(data)
+    forward = backend.dct2(data)
+    roundtrip = backend.idct2(forward.copy())
+    assert forward.dtype == roundtrip.dtype == backend.dtype
+    np.testing.assert_allclose(forward, reference, rtol=0, atol=TOLERANCE)
+    np.testing.assert_allclose(roundtrip, data, rtol=0, atol=TOLERANCE)
+
+@pytest.mark.parametrize("name", sorted(BACKENDS))
+def test_single_image_matches_stack(name, data):
+    backend = BACKENDS[name]()
+    np.testing.assert_array_equal(backend.dct2(data[1]), backend.dct2(data)[1])
+
+@pytest.mark.parametrize("shape", [(256, 256), (255, 257), (2, 128, 96)])
+@pytest.mark.parametrize("model, level", [("haar", 1), ("haar", 3), ("db1", 2), ("db2", 1), ("db2", 3), ("db4", 2)])
+@pytest.mark.parametrize("float32", [True, False])
+def test_approximation_matches_wavedec2(model, level, shape, float32):
+    backend = BACKENDS["scipy"](float32=float32)
+    data = np.random.default_rng(1).integers(0, 256, shape).astype(np.float32)
+    expected = pywt.wavedec2(data.astype(backend.dtype), model, level=level, axes=(-2, -1))[0]
+    LL = backend.approximation(data, model, level)
+    assert LL.dtype == backend.dtype
+    assert LL.shape == expected.shape
+    # LL grows by 2x per level, so scale the float32 tolerance with it
+    np.testing.assert_allclose(LL, expected, rtol=0, atol=TOLERANCE * 2 ** level if float32 else 1e-9)
+
+def test_compare_backends_reports_no_failures():
+    assert compare_backends() == []
+
+def test_compare_backends_reports_violations():
+    assert compare_backends(tolerance=0)
@@ -0,0 +1,204 @@
+"""Tiled DWT-DCT watermarking for full-resolution images.
+
+Instead of resizing the cover to 512x512, the image is split into square
+tiles and the watermark is embedded into every full tile with the usual
+DWT-DCT scheme. Inputs are 8-bit grayscale and, like the outputs,
+memory-mapped (.npy, raw or uncompressed TIFF), and each worker process maps the files itself and only
+touches one tile at a time, so peak memory is bounded by the tile size and
+worker count rather than the image size. Extraction averages the watermark
+recovered from every full tile. Partial tiles at the right and bottom
+edges are copied through unchanged.
+
+    python tiled.py embed scan.npy --watermark logo.png --output marked.npy
+    python tiled.py extract marked.npy --original scan.npy --output mark.png
+"""
+import argparse
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import numpy as np
+
+from wavesecure.core import convert_image, embed_watermark_dwtdct, extract_watermark_dwtdct, format_for_path, save_image
+
+# Per-process memory maps, opened once by the pool initializer
+_worker_state = {}
+
+def _is_tiff(path):
+    return path.lower().endswith((".tif", ".tiff"))
+
+def open_memmap(path, mode="r", shape=None, dtype=np.uint8):
+    """Memory-map a grayscale image stored as .npy, uncompressed TIFF or raw bytes.
+
+    With mode "w+" a new file of `shape` is created. Raw files always need
+    `shape` since they carry no header.
+    """
+    if path.lower().endswith(".npy"):
+        if mode == "w+":
+            return np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+        return np.load(path, mmap_mode=mode)
+
+    if _is_tiff(path):
+        try:
+            import tifffile
+        except ImportError:
+            raise ImportError("Memory-mapped TIFF support requires the 'tifffile' package") from None
+        if mode == "w+":
+            return tifffile.memmap(path, shape=shape, dtype=dtype, photometric="minisblack")
+        return tifffile.memmap(path, mode=mode)
+
+    if shape is None:
+        raise ValueError(f"Raw image {path} needs an explicit shape")
+    return np.memmap(path, dtype=dtype, mode=mode, shape=tuple(shape))
+
+def iter_tiles(shape, tile):
+    """Yield (row, col, height, width) for every tile, including partial edge tiles"""
+    height, width = shape
+    for row in range(0, height, tile):
+        for col in range(0, width, tile):
+            yield row, col, min(tile, height - row), min(tile, width - col)
+
+def watermark_size(tile, level):
+    """Side of the watermark block that fits the LL subband of one tile"""
+    return (tile >> level) // 2
+
+def _check_image(image, tile, level):
+    if image.ndim != 2:
+        raise ValueError(f"Tiled mode expects a single-channel image, got shape {image.shape}")
+    if image.dtype != np.uint8:
+        # embed_watermark_dwtdct clips its result to 0-255, which would flatten deeper images
+        raise ValueError(f"Tiled mode expects an 8-bit image, got {image.dtype}")
+    if tile % (1 << level):
+        raise ValueError(f"Tile size {tile} must be a multiple of 2**level ({1 << level})")
+    if min(image.shape) < tile:
+        raise ValueError(f"Image of shape {image.shape} is smaller than one {tile}px tile")
+
+def _init_worker(state):
+    _worker_state.clear()
+    _worker_state.update(state)
+    _worker_state["input"] = open_memmap(state["input_path"], "r", state["shape"])
+    if state.get("output_path"):
+        _worker_state["output"] = open_memmap(state["output_path"], "r+", state["shape"])
+    if state.get("original_path"):
+        _worker_state["original"] = open_memmap(state["original_path"], "r", state["shape"])
+
+def _embed_tile(row, col, height, width):
+    state = _worker_state
+    block = np.asarray(state["input"][row:row + height, col:col + width])
+    if height == state["tile"] and width == state["tile"]:
+        block = embed_watermark_dwtdct(block, state["watermark"], state["model"], state["level"], state["alpha"])
+    state["output"][row:row + height, col:col + width] = block[:height, :width]
+
+def _extract_tile(row, col, height, width):
+    state = _worker_state
+    block = np.asarray(state["input"][row:row + height, col:col + width])
+    original = None
+    if "original" in state:
+        original = np.asarray(state["original"][row:row + height, col:col + width])
+    extracted = extract_watermark_dwtdct(block, original, state["model"], state["level"], state["alpha"])
+    # The LL subband can be a few pixels larger than the embedded mark (e.g. 33 vs 32 for db2)
+    size = watermark_size(state["tile"], state["level"])
+    return extracted[:size, :size]
+
+def embed_tiled(input_path, watermark, output_path, model, level, alpha=0.1, tile=512, workers=None, shape=None):
+    """Embed `watermark` into every full tile of a memory-mapped cover.
+
+    The watermark is resized to fit one tile's LL subband. Returns the
+    number of tiles processed.
+    """
+    image = open_memmap(input_path, "r", shape)
+    _check_image(image, tile, level)
+    shape = image.shape
+
+    size = watermark_size(tile, level)
+    watermark = cv2.resize(np.asarray(watermark), (size, size))
+
+    output = open_memmap(output_path, "w+", shape, image.dtype)
+    del output, image  # workers map the files themselves
+
+    state = dict(
+        input_path=input_path, output_path=output_path, shape=shape, tile=tile,
+        watermark=watermark, model=model, level=level, alpha=alpha,
+    )
+    tiles = list(iter_tiles(shape, tile))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(state,)) as pool:
+        for future in as_completed([pool.submit(_embed_tile, *t) for t in tiles]):
+            future.result()
+    return len(tiles)
+
+def extract_tiled(input_path, original_path, model, level, alpha, tile=512, workers=None, shape=None):
+    """Extract the watermark from every full tile and return their float32 average.
+
+    The result is `watermark_size(tile, level)` square, the size embedded.
+    """
+    image = open_memmap(input_path, "r", shape)
+    _check_image(image, tile, level)
+    shape = image.shape
+    del image
+
+    state = dict(
+        input_path=input_path, original_path=original_path, shape=shape, tile=tile,
+        model=model, level=level, alpha=alpha,
+    )
+    tiles = [t for t in iter_tiles(shape, tile) if t[2] == tile and t[3] == tile]
+    total = None
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(state,)) as pool:
+        for future in as_completed([pool.submit(_extract_tile, *t) for t in tiles]):
+            extracted = future.result()
+            total = extracted.astype(np.float64) if total is None else total + extracted
+    return (total / len(tiles)).astype(np.float32)
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Tiled, memory-mapped DWT-DCT watermarking for large images.")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    def add_common(sub):
+        sub.add_argument("input", help="8-bit grayscale image as .npy, uncompressed TIFF or raw bytes")
+        sub.add_argument("--output", required=True, help="Output path")
+        sub.add_argument("--shape", type=int, nargs=2, metavar=("HEIGHT", "WIDTH"), help="Shape of raw inputs")
+        sub.add_argument("--tile", type=int, default=512, help="Tile size in pixels (default: 512)")
+        sub.add_argument("--wavelet", default="haar", help="Wavelet model (default: haar)")
+        sub.add_argument("--level", type=int, default=1, help="Decomposition level (default: 1)")
+        sub.add_argument("--alpha", type=float, default=0.1, help="Embedding strength (default: 0.1)")
+        sub.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+
+    embed = subparsers.add_parser("embed", help="Embed a watermark into every tile")
+    add_common(embed)
+    embed.add_argument("--watermark", required=True, help="Watermark image")
+
+    extract = subparsers.add_parser("extract", help="Extract the tile-averaged watermark")
+    add_common(extract)
+    extract.add_argument("--original", default=None, help="Original (same format) for non-blind extraction")
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    start = time.perf_counter()
+
+    if args.mode == "embed":
+        watermark = convert_image(args.watermark, watermark_size(args.tile, args.level))
+        try:
+            count = embed_tiled(
+                args.input, watermark, args.output, args.wavelet, args.level, args.alpha,
+                args.tile, args.workers, args.shape,
+            )
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 1
+        print(f"Embedded watermark into {args.output} ({count} tiles) in {time.perf_counter() - start:.2f} s")
+    else:
+        try:
+            extracted = extract_tiled(
+                args.input, args.original, args.wavelet, args.level, args.alpha, args.tile, args.workers, args.shape
+            )
+        except ValueError as e:
+            print(e, file=sys.stderr)
+            return 1
+        save_image(args.output, np.clip(extracted, 0, 255).astype(np.uint8), format_for_path(args.output))
+        print(f"Extracted watermark to {args.output} in {time.perf_counter() - start:.2f} s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
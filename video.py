@@ -0,0 +1,282 @@
+"""Streaming DWT-DCT watermarking for video.
+
+Frames are watermarked at native resolution on the luma (Y) channel, with
+the watermark resized to fit each frame's LL subband. Decoding, the
+transform and encoding run as overlapping pipeline stages connected by
+bounded queues, so memory stays flat regardless of video length. The
+extractor can sample every Nth frame and averages the recovered marks.
+
+    python video.py embed clip.mp4 --watermark logo.png --output clip_wm.mp4
+    python video.py extract clip_wm.mp4 --original clip.mp4 --every 10 --output mark.png
+"""
+import argparse
+import queue
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+import pywt
+
+from wavesecure.core import convert_image, embed_watermark_dwtdct, extract_watermark_dwtdct, format_for_path, save_image
+
+_DONE = object()
+
+def watermark_shape(frame_shape, model, level):
+    """(height, width) of the watermark block for frames of `frame_shape`"""
+    LL_shape = pywt.wavedecn_shapes(frame_shape[:2], model, level=level, axes=(0, 1))[0]
+    return LL_shape[0] // 2, LL_shape[1] // 2
+
+def _luma(frame):
+    if frame.ndim == 2:
+        return frame, None
+    ycrcb = cv2.cvtColor(frame, cv2.COLOR_BGR2YCrCb)
+    return ycrcb[..., 0], ycrcb
+
+def embed_frame(frame, watermark, model, level, alpha):
+    """Embed into the luma of a BGR (or grayscale) frame"""
+    luma, ycrcb = _luma(frame)
+    marked = embed_watermark_dwtdct(luma, watermark, model, level, alpha)[:luma.shape[0], :luma.shape[1]]
+    if ycrcb is None:
+        return marked
+    ycrcb[..., 0] = marked
+    return cv2.cvtColor(ycrcb, cv2.COLOR_YCrCb2BGR)
+
+def extract_frame(frame, original_frame, model, level, alpha):
+    """Extract the watermark from the luma of one frame"""
+    original_luma = None if original_frame is None else _luma(original_frame)[0]
+    return extract_watermark_dwtdct(_luma(frame)[0], original_luma, model, level, alpha)
+
+class _Pipeline:
+    """Decode -> transform (N threads) -> ordered consumer, linked by bounded queues
+
+    A semaphore caps the frames between decode and yield, so a slow frame
+    cannot let the reorder buffer grow while later frames keep arriving.
+    """
+
+    def __init__(self, frames, transform, workers, queue_size):
+        self.decoded = queue.Queue(maxsize=queue_size)
+        self.processed = queue.Queue(maxsize=queue_size)
+        self.in_flight = threading.Semaphore(2 * queue_size + workers)
+        self.errors = []
+        self.stop = threading.Event()
+        self.workers = workers
+        self.threads = [threading.Thread(target=self._decode, args=(frames,), daemon=True)]
+        self.threads += [threading.Thread(target=self._transform, args=(transform,), daemon=True) for _ in range(workers)]
+
+    def _put(self, q, item):
+        while not self.stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _acquire(self):
+        while not self.stop.is_set():
+            if self.in_flight.acquire(timeout=0.1):
+                return True
+        return False
+
+    def _decode(self, frames):
+        try:
+            items = enumerate(frames)
+            # Take a slot before decoding; results() gives it back when the frame is yielded
+            while self._acquire():
+                item = next(items, None)
+                if item is None or not self._put(self.decoded, item):
+                    return
+        except Exception as e:
+            self.errors.append(e)
+            self.stop.set()
+        finally:
+            for _ in range(self.workers):
+                self._put(self.decoded, _DONE)
+
+    def _transform(self, transform):
+        try:
+            while not self.stop.is_set():
+                try:
+                    item = self.decoded.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                if item is _DONE:
+                    break
+                index, frame = item
+                if not self._put(self.processed, (index, transform(frame))):
+                    return
+        except Exception as e:
+            self.errors.append(e)
+            self.stop.set()
+        finally:
+            self._put(self.processed, _DONE)
+
+    def results(self):
+        """Yield transformed frames in their original order"""
+        for thread in self.threads:
+            thread.start()
+        pending, next_index, finished = {}, 0, 0
+        try:
+            while finished < self.workers:
+                try:
+                    item = self.processed.get(timeout=0.1)
+                except queue.Empty:
+                    if self.errors:
+                        raise self.errors[0]
+                    continue
+                if item is _DONE:
+                    finished += 1
+                    continue
+                pending[item[0]] = item[1]
+                while next_index in pending:
+                    frame = pending.pop(next_index)
+                    self.in_flight.release()
+                    yield frame
+                    next_index += 1
+            if self.errors:
+                raise self.errors[0]
+        finally:
+            self.stop.set()
+
+def _read_frames(capture, every=1):
+    """Yield decoded frames, only decoding every `every`-th one"""
+    index = 0
+    while True:
+        if index % every == 0:
+            ok, frame = capture.read()
+        else:
+            ok, frame = capture.grab(), None
+        if not ok:
+            return
+        if frame is not None:
+            yield frame
+        index += 1
+
+def _open(path):
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise FileNotFoundError(f"Video not found or cannot be read: {path}")
+    return capture
+
+def embed_video(input_path, watermark, output_path, model, level, alpha=0.1, fourcc="mp4v",
+                workers=2, queue_size=8, progress=None):
+    """Watermark every frame of a video; returns dict(frames, seconds, fps)"""
+    capture = _open(input_path)
+    fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+    width = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    mark_height, mark_width = watermark_shape((height, width), model, level)
+    watermark = cv2.resize(np.asarray(watermark), (mark_width, mark_height))
+
+    writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*fourcc), fps, (width, height))
+    if not writer.isOpened():
+        capture.release()
+        raise IOError(f"Could not open video writer for {output_path} with codec {fourcc}")
+
+    pipeline = _Pipeline(
+        _read_frames(capture), lambda frame: embed_frame(frame, watermark, model, level, alpha), workers, queue_size
+    )
+    start = time.perf_counter()
+    frames = 0
+    try:
+        for frame in pipeline.results():
+            writer.write(frame)
+            frames += 1
+            if progress:
+                progress(frames, time.perf_counter() - start)
+    finally:
+        writer.release()
+        capture.release()
+
+    seconds = time.perf_counter() - start
+    return dict(frames=frames, seconds=seconds, fps=frames / seconds if seconds > 0 else 0.0)
+
+def extract_video(input_path, original_path, model, level, alpha, every=1, workers=2, queue_size=8, progress=None):
+    """Average the watermark over every `every`-th frame; returns (watermark, stats)"""
+    capture = _open(input_path)
+    original = _open(original_path) if original_path else None
+
+    frames = _read_frames(capture, every)
+    if original is not None:
+        frames = zip(frames, _read_frames(original, every))
+        transform = lambda pair: extract_frame(pair[0], pair[1], model, level, alpha)
+    else:
+        transform = lambda frame: extract_frame(frame, None, model, level, alpha)
+
+    pipeline = _Pipeline(frames, transform, workers, queue_size)
+    start = time.perf_counter()
+    total, count = None, 0
+    try:
+        for extracted in pipeline.results():
+            total = extracted.astype(np.float64) if total is None else total + extracted
+            count += 1
+            if progress:
+                progress(count, time.perf_counter() - start)
+    finally:
+        capture.release()
+        if original is not None:
+            original.release()
+
+    if not count:
+        raise ValueError(f"No frames could be read from {input_path}")
+    seconds = time.perf_counter() - start
+    stats = dict(frames=count, seconds=seconds, fps=count / seconds if seconds > 0 else 0.0)
+    return (total / count).astype(np.float32), stats
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Streaming DWT-DCT watermarking for video files.")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    def add_common(sub):
+        sub.add_argument("input", help="Input video")
+        sub.add_argument("--output", required=True, help="Output video (embed) or watermark image (extract)")
+        sub.add_argument("--wavelet", default="haar", help="Wavelet model (default: haar)")
+        sub.add_argument("--level", type=int, default=1, help="Decomposition level (default: 1)")
+        sub.add_argument("--alpha", type=float, default=0.1, help="Embedding strength (default: 0.1)")
+        sub.add_argument("--workers", type=int, default=2, help="Transform threads (default: 2)")
+        sub.add_argument("--queue-size", type=int, default=8, help="Frames buffered between stages (default: 8)")
+
+    embed = subparsers.add_parser("embed", help="Watermark every frame")
+    add_common(embed)
+    embed.add_argument("--watermark", required=True, help="Watermark image")
+    embed.add_argument("--fourcc", default="mp4v", help="Output codec FourCC (default: mp4v)")
+
+    extract = subparsers.add_parser("extract", help="Extract the frame-averaged watermark")
+    add_common(extract)
+    extract.add_argument("--original", default=None, help="Original video for non-blind extraction")
+    extract.add_argument("--every", type=int, default=1, help="Only sample every Nth frame (default: 1)")
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    def report(frames, seconds):
+        if frames % 100 == 0:
+            print(f"{frames} frames, {frames / seconds:.1f} fps", file=sys.stderr)
+
+    try:
+        if args.mode == "embed":
+            watermark = convert_image(args.watermark, 128)
+            stats = embed_video(
+                args.input, watermark, args.output, args.wavelet, args.level, args.alpha,
+                args.fourcc, args.workers, args.queue_size, report,
+            )
+        else:
+            extracted, stats = extract_video(
+                args.input, args.original, args.wavelet, args.level, args.alpha,
+                args.every, args.workers, args.queue_size, report,
+            )
+            save_image(args.output, np.clip(extracted, 0, 255).astype(np.uint8), format_for_path(args.output))
+    except (OSError, ValueError, cv2.error) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    print(f"Processed {stats['frames']} frames in {stats['seconds']:.2f} s ({stats['fps']:.1f} fps)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,44 @@
+"""WaveSecure: DWT-DCT digital image watermarking, usable without the GUI.
+
+Public names are resolved lazily: `import wavesecure` loads nothing but
+this file, and each submodule (with OpenCV, PyWavelets or SciPy behind
+it) is imported the first time one of its names is used.
+
+    from wavesecure import convert_image, embed_watermark_dwtdct
+"""
+import importlib
+
+_EXPORTS = {
+    "core": (
+        "OUTPUT_FORMATS", "EXTENSION_FORMATS", "IMAGE_EXTENSIONS", "collect_inputs", "convert_image", "decode_image", "encode_image",
+        "format_for_path", "save_image",
+        "image_cache", "coefficient_cache", "original_coefficients", "load_original_coefficients",
+        "apply_dct", "apply_idct", "process_coefficients", "approximation_coefficients", "watermark_shape", "fit_watermark",
+        "prepare_cover", "embed_prepared",
+        "embed_watermark_dwtdct", "extract_watermark_dwtdct",
+        "embed_watermark_dwtdct_batch", "extract_watermark_dwtdct_batch",
+        "alpha_basis", "watermarked_for_alphas", "psnr_stack", "find_alpha", "search_alpha",
+    ),
+    "attacks": ("ATTACKS", "DEFAULT_ATTACKS", "apply_attack"),
+    "cache": ("CoefficientCache", "ImageCache", "file_digest"),
+    "instrument": ("Trace", "stage"),
+    "jobs": ("Job", "JobCancelled", "JobExecutor"),
+    "metrics": ("bit_error_rate", "normalized_correlation", "psnr", "ssim"),
+    "registry": ("WatermarkRegistry", "watermark_vectors"),
+    "transforms": ("BACKENDS", "get_backend", "set_backend"),
+}
+
+_MODULE_OF = {name: module for module, names in _EXPORTS.items() for name in names}
+
+__all__ = sorted(_MODULE_OF)
+
+def __getattr__(name):
+    module = _MODULE_OF.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
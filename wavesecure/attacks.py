@@ -0,0 +1,68 @@
+"""Attacks used to test watermark robustness.
+
+Each attack takes a uint8 grayscale image, one parameter and a seed, and
+returns a uint8 image of the same size.
+"""
+import cv2
+import numpy as np
+
+def attack_noise(img, sigma, seed=0):
+    """Additive Gaussian noise with standard deviation `sigma`"""
+    noise = np.random.default_rng(seed).normal(0, sigma, img.shape).astype(np.float32)
+    return np.clip(img.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+
+def attack_jpeg(img, quality, seed=0):
+    """JPEG re-compression at `quality`"""
+    ok, buffer = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    return cv2.imdecode(buffer, cv2.IMREAD_GRAYSCALE)
+
+def attack_blur(img, sigma, seed=0):
+    """Gaussian blur with standard deviation `sigma`"""
+    return cv2.GaussianBlur(img, (0, 0), sigma)
+
+def attack_scale(img, factor, seed=0):
+    """Downscale by `factor` and scale back to the original size"""
+    height, width = img.shape
+    small = cv2.resize(img, (max(1, round(width * factor)), max(1, round(height * factor))), interpolation=cv2.INTER_AREA)
+    return cv2.resize(small, (width, height), interpolation=cv2.INTER_LINEAR)
+
+def attack_crop(img, fraction, seed=0):
+    """Blank out a border of `fraction` of each side, keeping the geometry"""
+    height, width = img.shape
+    top, left = round(height * fraction), round(width * fraction)
+    cropped = np.zeros_like(img)
+    cropped[top:height - top, left:width - left] = img[top:height - top, left:width - left]
+    return cropped
+
+def attack_rotate(img, degrees, seed=0):
+    """Rotate about the centre by `degrees`, keeping the original canvas"""
+    height, width = img.shape
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), degrees, 1.0)
+    return cv2.warpAffine(img, matrix, (width, height), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REFLECT)
+
+ATTACKS = {
+    "noise": attack_noise,
+    "jpeg": attack_jpeg,
+    "blur": attack_blur,
+    "scale": attack_scale,
+    "crop": attack_crop,
+    "rotate": attack_rotate,
+}
+
+# Parameters swept by the robustness benchmark, mildest first
+DEFAULT_ATTACKS = {
+    "noise": [5, 15, 25],
+    "jpeg": [90, 70, 50],
+    "blur": [0.5, 1.0],
+    "scale": [0.75, 0.5],
+    "crop": [0.1, 0.25],
+    "rotate": [1, 5],
+}
+
+def apply_attack(name, img, param=None, seed=0):
+    """Apply the attack called `name`; without `param` its mildest default parameter is used"""
+    if name not in ATTACKS:
+        raise ValueError(f"Unknown attack {name!r}; choose from {', '.join(ATTACKS)}")
+    if param is None:
+        param = DEFAULT_ATTACKS[name][0]
+    return ATTACKS[name](img, param, seed)
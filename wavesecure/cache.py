@@ -0,0 +1,256 @@
+"""Caches shared by the WaveSecure GUI and batch tools."""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Most recently used digests, keyed on (path, mtime, size)
+DIGEST_MEMO_SIZE = 4096
+_digest_memo = OrderedDict()
+_digest_lock = threading.Lock()
+
+def file_digest(path):
+    """Content hash of a file, memoized on (path, mtime, size) so unchanged files are read once"""
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    with _digest_lock:
+        digest = _digest_memo.get(memo_key)
+        if digest is not None:
+            _digest_memo.move_to_end(memo_key)
+            return digest
+
+    hasher = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            hasher.update(chunk)
+    digest = hasher.hexdigest()
+
+    with _digest_lock:
+        _digest_memo[memo_key] = digest
+        while len(_digest_memo) > DIGEST_MEMO_SIZE:
+            _digest_memo.popitem(last=False)
+    return digest
+
+class CoefficientCache:
+    """Bounded LRU cache of transform coefficient arrays.
+
+    Entries are evicted least-recently-used first once the total size
+    exceeds `max_bytes`. If `spill_dir` is set, evicted arrays are written
+    there as .npy files and loaded back on a later miss instead of being
+    recomputed; `clear()` deletes the files this cache wrote. `on_evict`,
+    if given, is called with each evicted key.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, spill_dir=None, on_evict=None):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        self._spilled = set()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+    def _spill_path(self, key):
+        name = hashlib.blake2b(repr(key).encode("utf-8"), digest_size=16).hexdigest()
+        return os.path.join(self.spill_dir, f"{name}.npy")
+
+    def get(self, key):
+        """Return the cached array for `key`, or None"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+        if self.spill_dir:
+            path = self._spill_path(key)
+            if os.path.exists(path):
+                value = np.load(path)
+                self.put(key, value)
+                with self._lock:
+                    self.hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        """Store `value` (treated as read-only) and evict until under the memory cap"""
+        value.setflags(write=False)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._nbytes -= old.nbytes
+            self._entries[key] = value
+            self._nbytes += value.nbytes
+
+            evicted = []
+            while self._nbytes > self.max_bytes and len(self._entries) > 1:
+                old_key, old_value = self._entries.popitem(last=False)
+                self._nbytes -= old_value.nbytes
+                evicted.append((old_key, old_value))
+
+        if self.spill_dir:
+            os.makedirs(self.spill_dir, exist_ok=True)
+            for old_key, old_value in evicted:
+                path = self._spill_path(old_key)
+                np.save(path, old_value)
+                with self._lock:
+                    self._spilled.add(path)
+        if self.on_evict:
+            for old_key, _ in evicted:
+                self.on_evict(old_key)
+
+    def get_or_compute(self, key, compute):
+        """Return the cached array for `key`, calling `compute()` and caching it on a miss"""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def discard(self, key):
+        """Drop `key` from memory if present (spilled copies are left alone)"""
+        with self._lock:
+            value = self._entries.pop(key, None)
+            if value is not None:
+                self._nbytes -= value.nbytes
+
+    def clear(self):
+        """Drop every entry, including the spill files written by this cache"""
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+            spilled, self._spilled = self._spilled, set()
+        for path in spilled:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+class ImageCache:
+    """Decoded images and their resized variants, keyed on file path.
+
+    Each file is decoded once, in color; the grayscale image the pipeline
+    works on is converted from that decode, and resized copies (the 512
+    cover, the 128 watermark, the color preview) are derived and cached as
+    well.
+    Everything cached for a path is dropped as soon as its mtime or size
+    changes. All entries share one LRU memory cap. Returned arrays are
+    read-only and shared; copy them before modifying.
+    """
+
+    def __init__(self, max_bytes=128 * 1024 * 1024):
+        self._arrays = CoefficientCache(max_bytes, on_evict=self._forget)
+        self._stamps = {}
+        self._keys = {}
+        self._lock = threading.Lock()
+
+    @property
+    def max_bytes(self):
+        return self._arrays.max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, value):
+        self._arrays.max_bytes = value
+
+    @property
+    def nbytes(self):
+        return self._arrays.nbytes
+
+    def _stamp(self, path):
+        """(absolute path, stamp) after dropping entries made from an older version of the file"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            raise FileNotFoundError(f"Image not found or cannot be read: {path}") from None
+        path = os.path.abspath(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if self._stamps.get(path) != stamp:
+                for key in self._keys.pop(path, ()):
+                    self._arrays.discard(key)
+                self._stamps[path] = stamp
+            return path, stamp
+
+    def _remember(self, path, key):
+        with self._lock:
+            self._keys.setdefault(path, set()).add(key)
+
+    def _forget(self, key):
+        """Eviction hook: stop tracking `key`, and its file once nothing of it is cached"""
+        path = key[1]
+        with self._lock:
+            keys = self._keys.get(path)
+            if keys is None:
+                return
+            keys.discard(key)
+            if not keys:
+                del self._keys[path]
+                self._stamps.pop(path, None)
+
+    def load(self, path, color=False):
+        """Full-resolution decode of `path`, grayscale or (with `color`) RGB"""
+        path, stamp = self._stamp(path)
+        key = ("decoded", path, stamp, color)
+        self._remember(path, key)
+        if color:
+            return self._arrays.get_or_compute(key, lambda: _decode(path))
+
+        def compute():
+            import cv2
+            return cv2.cvtColor(self.load(path, color=True), cv2.COLOR_RGB2GRAY)
+
+        return self._arrays.get_or_compute(key, compute)
+
+    def resized(self, path, size, interpolation=None, color=False):
+        """`path` resized to `size` (an int for square, or (width, height))"""
+        import cv2
+        from .instrument import stage
+        if interpolation is None:
+            interpolation = cv2.INTER_LINEAR
+        size = (size, size) if isinstance(size, int) else tuple(size)
+        path, stamp = self._stamp(path)
+        key = ("resized", path, stamp, size, interpolation, color)
+        self._remember(path, key)
+
+        def compute():
+            image = self.load(path, color)
+            with stage("resize") as s:
+                return s.record(cv2.resize(image, size, interpolation=interpolation))
+
+        return self._arrays.get_or_compute(key, compute)
+
+    def preview(self, path, size=250, color=True):
+        """Thumbnail for display, area-downsampled (cheaper than Lanczos and alias-free)"""
+        import cv2
+        return self.resized(path, size, cv2.INTER_AREA, color)
+
+    def clear(self):
+        with self._lock:
+            self._arrays.clear()
+            self._stamps.clear()
+            self._keys.clear()
+
+def _decode(path):
+    """RGB decode of `path`"""
+    import cv2
+    from .instrument import stage
+    with stage("decode") as s:
+        image = s.record(cv2.imread(path, cv2.IMREAD_COLOR))
+    if image is None:
+        raise FileNotFoundError(f"Image not found or cannot be read: {path}")
+    return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
@@ -0,0 +1,353 @@
+"""Core DWT-DCT watermarking algorithms, free of any GUI dependency.
+
+OpenCV is imported on first use, and the transform backends load SciPy and
+PyWavelets lazily, so importing this module stays cheap for short-lived
+workers.
+"""
+import atexit
+import os
+
+import numpy as np
+
+from .cache import CoefficientCache, ImageCache, file_digest
+from .instrument import stage
+from .transforms import get_backend
+
+# Every file is decoded once per session; previews and the 512/128 working
+# sizes are derived from that decode (see ImageCache).
+image_cache = ImageCache()
+
+def convert_image(image_path, size):
+    """Convert image to grayscale and resize it (decoded once via image_cache; returns a private copy)"""
+    return image_cache.resized(image_path, size).copy()
+
+def decode_image(data, size):
+    """Decode encoded image bytes to grayscale and resize, like `convert_image` for in-memory files"""
+    import cv2
+    with stage("decode") as s:
+        img = s.record(cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR))
+    if img is None:
+        raise ValueError("Data is not a readable image")
+    # Same color-then-convert path as image_cache, so bytes and files give identical pixels
+    img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    with stage("resize") as s:
+        return s.record(cv2.resize(img, (size, size)))
+
+# Codecs offered when saving results; PNG and TIFF are lossless
+OUTPUT_FORMATS = {"PNG": ".png", "TIFF": ".tiff", "JPEG": ".jpg"}
+EXTENSION_FORMATS = {".png": "PNG", ".jpg": "JPEG", ".jpeg": "JPEG", ".tif": "TIFF", ".tiff": "TIFF"}
+
+# Files picked up when a directory is given as input
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff")
+
+def collect_inputs(source, extensions=IMAGE_EXTENSIONS):
+    """Return the image paths named by a directory or a manifest file.
+
+    A manifest is a text file with one path per line; relative paths are
+    resolved against the manifest's directory and lines starting with '#'
+    are ignored. Directory entries are filtered by `extensions`; manifest
+    entries are taken as listed.
+    """
+    if os.path.isdir(source):
+        return sorted(
+            os.path.join(source, name)
+            for name in os.listdir(source)
+            if name.lower().endswith(extensions)
+        )
+
+    if not os.path.isfile(source):
+        raise FileNotFoundError(f"Input directory or manifest not found: {source}")
+
+    base_dir = os.path.dirname(os.path.abspath(source))
+    paths = []
+    with open(source, encoding="utf-8") as manifest:
+        for line in manifest:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                paths.append(line if os.path.isabs(line) else os.path.join(base_dir, line))
+    return paths
+
+def encode_image(image_array, fmt="PNG", quality=95):
+    """Encode an image array in one of OUTPUT_FORMATS and return the bytes"""
+    import cv2
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {fmt}")
+    params = [cv2.IMWRITE_JPEG_QUALITY, int(quality)] if fmt == "JPEG" else []
+    with stage("encode", image_array):
+        ok, buffer = cv2.imencode(OUTPUT_FORMATS[fmt], image_array, params)
+    if not ok:
+        raise IOError(f"Could not encode image as {fmt}")
+    return buffer.tobytes()
+
+def format_for_path(path):
+    """Output format implied by a file extension, defaulting to PNG"""
+    return EXTENSION_FORMATS.get(os.path.splitext(path)[1].lower(), "PNG")
+
+def save_image(path, image_array, fmt="PNG", quality=95):
+    """Encode an image array with the chosen codec and write it to `path`"""
+    data = encode_image(image_array, fmt, quality)
+    with stage("write"), open(path, "wb") as f:
+        f.write(data)
+
+# Originals rarely change between extractions, so their transformed LL
+# subband is cached rather than recomputed for every suspect image. Set
+# WAVESECURE_SPILL_DIR to keep evicted entries on disk instead of dropping
+# them; the spilled files are removed at exit.
+coefficient_cache = CoefficientCache(spill_dir=os.environ.get("WAVESECURE_SPILL_DIR") or None)
+atexit.register(coefficient_cache.clear)
+
+def original_coefficients(image_path, model, level, size=512):
+    """DCT of the original's LL subband, cached on (content hash, size, wavelet, level)"""
+    key = (file_digest(image_path), size, model, level, np.dtype(get_backend().dtype).name)
+    return coefficient_cache.get_or_compute(
+        key, lambda: apply_dct(approximation_coefficients(convert_image(image_path, size), model, level))
+    )
+
+def load_original_coefficients(image_path, model, level):
+    """Original's LL DCT for non-blind extraction, or None to fall back to blind"""
+    if not image_path:
+        return None
+    try:
+        return original_coefficients(image_path, model, level)
+    except Exception:
+        return None
+
+def apply_dct(image_array):
+    """Apply 2D DCT over the last two axes (works for single images and stacks)"""
+    with stage("dct", image_array):
+        return get_backend().dct2(image_array)
+
+def apply_idct(dct_array, overwrite=False):
+    """Apply inverse 2D DCT over the last two axes; `overwrite` lets it reuse the input buffer"""
+    with stage("idct", dct_array):
+        return get_backend().idct2(dct_array, overwrite)
+
+def process_coefficients(image_array, model, level):
+    """Apply DWT to image (or an (N, H, W) stack) and get coefficients"""
+    with stage("dwt", image_array):
+        return get_backend().wavedec2(image_array, model, level)
+
+def approximation_coefficients(image_array, model, level):
+    """LL subband only (image or (N, H, W) stack), skipping the detail subbands extraction never reads"""
+    with stage("dwt-ll", image_array):
+        return get_backend().approximation(image_array, model, level)
+
+def _embed_region(LL_dct_shape):
+    """Top-left corner of the mid-frequency block the watermark is written to"""
+    return LL_dct_shape[-2] // 4, LL_dct_shape[-1] // 4
+
+def watermark_shape(LL_shape):
+    """Shape of the watermark block an LL subband of `LL_shape` carries (and extraction returns)"""
+    return LL_shape[-2] // 2, LL_shape[-1] // 2
+
+def fit_watermark(watermark, LL_shape):
+    """Resize watermark to `watermark_shape(LL_shape)` so it matches what extraction recovers"""
+    height, width = watermark_shape(LL_shape)
+    if watermark.shape[-2:] == (height, width):
+        return watermark
+    import cv2
+    return cv2.resize(watermark, (width, height))
+
+def _modulate(LL_dct, watermark, alpha):
+    """Multiplicatively embed watermark into LL_dct in place, for one image or a stack"""
+    row, col = _embed_region(LL_dct.shape)
+    h_w, w_w = watermark.shape[-2:]
+    if row + h_w > LL_dct.shape[-2] or col + w_w > LL_dct.shape[-1]:
+        raise ValueError(
+            f"Watermark of size {h_w}x{w_w} does not fit the LL subband of size "
+            f"{LL_dct.shape[-2]}x{LL_dct.shape[-1]}; use a lower decomposition level."
+        )
+    with stage("modulate", watermark):
+        gain = 1.0 + alpha * (watermark.astype(LL_dct.dtype) / 255.0)
+        LL_dct[..., row:row + h_w, col:col + w_w] *= gain
+    return LL_dct
+
+def _demodulate(w_LL_dct, o_LL_dct, alpha):
+    """Recover the watermark block from LL_dct (and the original's LL_dct when non-blind)"""
+    row, col = _embed_region(w_LL_dct.shape)
+    h_ext, w_ext = watermark_shape(w_LL_dct.shape)
+    w_block = w_LL_dct[..., row:row + h_ext, col:col + w_ext]
+
+    if o_LL_dct is not None:
+        o_block = np.broadcast_to(o_LL_dct[..., row:row + h_ext, col:col + w_ext], w_block.shape)
+        alpha = np.asarray(alpha, dtype=w_block.dtype)
+        valid = (np.abs(o_block) > 1e-6) & (alpha != 0)
+        watermark = np.full(w_block.shape, 128.0, dtype=np.float32)
+        ratio = np.divide(w_block, o_block, out=np.ones(w_block.shape, dtype=w_block.dtype), where=valid)
+        safe_alpha = np.where(alpha != 0, alpha, 1.0)
+        np.copyto(watermark, (ratio - 1.0) / safe_alpha * 255.0, where=valid, casting='unsafe')
+        return watermark
+
+    mean_coeff = w_block.mean(axis=(-2, -1), keepdims=True)
+    return ((w_block - mean_coeff) * 5.0 + 128.0).astype(np.float32)
+
+def prepare_cover(image_array, model, level):
+    """Forward DWT of the cover plus the DCT of its LL subband, reusable across alphas"""
+    coeffs = process_coefficients(image_array, model, level)
+    return coeffs, apply_dct(coeffs[0])
+
+def embed_prepared(coeffs, LL_dct, watermark, model, alpha=0.1):
+    """Embed watermark into a cover already transformed by `prepare_cover` (inputs are not modified)"""
+    LL_watermarked = apply_idct(_modulate(LL_dct.copy(), watermark, alpha), overwrite=True)
+    coeffs_watermarked = list(coeffs)
+    coeffs_watermarked[0] = LL_watermarked
+
+    with stage("idwt") as s:
+        watermarked_img = s.record(get_backend().waverec2(coeffs_watermarked, model))
+    return np.clip(watermarked_img, 0, 255).astype(np.uint8)
+
+def embed_watermark_dwtdct(image_array, watermark, model, level, alpha=0.1):
+    """Embed watermark using DWT-DCT method"""
+    coeffs, LL_dct = prepare_cover(image_array, model, level)
+    return embed_prepared(coeffs, LL_dct, watermark, model, alpha)
+
+def extract_watermark_dwtdct(watermarked_img, original_img, model, level, alpha, original_LL_dct=None):
+    """Extract watermark from watermarked image
+
+    For non-blind extraction pass either `original_img` or its precomputed
+    LL DCT as `original_LL_dct` (see `original_coefficients`). For a stack
+    of images `alpha` may also be an array broadcastable to (N, 1, 1).
+    """
+    w_LL_dct = apply_dct(approximation_coefficients(watermarked_img, model, level))
+
+    o_LL_dct = original_LL_dct
+    if o_LL_dct is None and original_img is not None:
+        o_LL_dct = apply_dct(approximation_coefficients(original_img, model, level))
+
+    with stage("demodulate", w_LL_dct):
+        return _demodulate(w_LL_dct, o_LL_dct, alpha)
+
+def embed_watermark_dwtdct_batch(images, watermarks, model, level, alpha=0.1):
+    """Embed watermarks into an (N, H, W) stack of covers in one call.
+
+    `watermarks` is either an (N, h, w) stack or a single (h, w) mark shared
+    by every cover. Returns an (N, H, W) uint8 stack.
+    """
+    images = np.asarray(images)
+    if images.ndim != 3:
+        raise ValueError(f"Expected an (N, H, W) stack of covers, got shape {images.shape}")
+    watermarks = np.asarray(watermarks)
+    if watermarks.ndim == 3 and watermarks.shape[0] != images.shape[0]:
+        raise ValueError(f"Got {watermarks.shape[0]} watermarks for {images.shape[0]} covers")
+    return embed_watermark_dwtdct(images, watermarks, model, level, alpha)
+
+def extract_watermark_dwtdct_batch(watermarked_imgs, original_imgs, model, level, alpha, original_LL_dct=None):
+    """Extract watermarks from an (N, H, W) stack of suspects in one call.
+
+    `original_imgs` may be None (blind), an (N, H, W) stack, or a single
+    (H, W) original shared by every suspect; a precomputed `original_LL_dct`
+    can be passed instead. Returns an (N, h, w) float32 stack.
+    """
+    watermarked_imgs = np.asarray(watermarked_imgs)
+    if watermarked_imgs.ndim != 3:
+        raise ValueError(f"Expected an (N, H, W) stack of suspects, got shape {watermarked_imgs.shape}")
+    if original_imgs is not None:
+        original_imgs = np.asarray(original_imgs)
+        if original_imgs.ndim == 3 and original_imgs.shape[0] != watermarked_imgs.shape[0]:
+            raise ValueError(f"Got {original_imgs.shape[0]} originals for {watermarked_imgs.shape[0]} suspects")
+    return extract_watermark_dwtdct(watermarked_imgs, original_imgs, model, level, alpha, original_LL_dct)
+
+# --- Alpha search ---
+
+def alpha_basis(coeffs, LL_dct, watermark, model):
+    """Split embedding into `recon + alpha * delta` for a prepared cover.
+
+    The IDCT and IDWT are linear, so the unclipped watermarked image for any
+    alpha is `recon + alpha * delta`; candidates then cost one multiply-add
+    instead of a full transform each.
+    """
+    backend = get_backend()
+    recon = backend.waverec2(coeffs, model)
+    modulation = _modulate(LL_dct.copy(), watermark, 1.0) - LL_dct
+    zero_details = [tuple(np.zeros_like(band) for band in detail) for detail in coeffs[1:]]
+    delta = backend.waverec2([apply_idct(modulation, overwrite=True)] + zero_details, model)
+    return recon, delta
+
+def watermarked_for_alphas(recon, delta, alphas):
+    """(K, H, W) uint8 stack of watermarked images, one per candidate alpha"""
+    alphas = np.asarray(alphas, dtype=np.float32).reshape(-1, 1, 1)
+    return np.clip(recon + alphas * delta, 0, 255).astype(np.uint8)
+
+def psnr_stack(reference, images):
+    """PSNR of every image in a stack against `reference` (inf when identical)"""
+    mse = np.mean((images.astype(np.float32) - reference.astype(np.float32)) ** 2, axis=(-2, -1))
+    with np.errstate(divide="ignore"):
+        return 10.0 * np.log10(255.0 ** 2 / mse)
+
+def find_alpha(meets_target, alpha_range=(0.0, 1.0), steps=21, tolerance=1e-3, strongest=True):
+    """Alpha at the boundary where `meets_target(alphas)` (a bool array) flips.
+
+    A vectorized sweep over `steps` evenly spaced alphas brackets the
+    boundary, then bisection narrows it to `tolerance`. With strongest=True
+    returns the largest qualifying alpha (for floors that fall as alpha
+    grows, like PSNR), otherwise the smallest (for floors that rise, like
+    NC). Returns None if no alpha in range qualifies.
+    """
+    low, high = alpha_range
+    grid = np.linspace(low, high, steps)
+    passing = np.flatnonzero(np.asarray(meets_target(grid), dtype=bool))
+    if not len(passing):
+        return None
+
+    if strongest:
+        i = passing[-1]
+        if i == steps - 1:
+            return float(high)
+        good, bad = grid[i], grid[i + 1]
+    else:
+        i = passing[0]
+        if i == 0:
+            return float(low)
+        good, bad = grid[i], grid[i - 1]
+
+    while abs(bad - good) > tolerance:
+        mid = (good + bad) / 2.0
+        if meets_target(np.array([mid]))[0]:
+            good = mid
+        else:
+            bad = mid
+    return float(good)
+
+def search_alpha(cover, watermark, model, level, min_psnr=None, min_nc=None, attack=None, attack_param=None,
+                 alpha_range=(0.0, 1.0), tolerance=1e-3, blind=False, seed=0):
+    """Find an alpha meeting a PSNR floor and/or an NC floor under an attack.
+
+    With only `min_psnr`, returns the strongest alpha keeping PSNR at or
+    above it. With only `min_nc`, returns the weakest alpha whose extracted
+    watermark reaches that NC after `attack` (see attacks.ATTACKS; its
+    mildest default parameter unless `attack_param` is given), or with no
+    attack. With both, returns the strongest PSNR-compliant alpha if it also
+    meets the NC floor. Returns None when the targets cannot be met in
+    `alpha_range`. The cover is transformed once and reused for every
+    candidate.
+    """
+    from .attacks import apply_attack
+    from .metrics import normalized_correlation
+
+    if min_psnr is None and min_nc is None:
+        raise ValueError("Specify a PSNR and/or NC target")
+    if attack is not None and min_nc is None:
+        raise ValueError("An attack only applies to an NC target")
+
+    coeffs, LL_dct = prepare_cover(cover, model, level)
+    recon, delta = alpha_basis(coeffs, LL_dct, watermark, model)
+    original_LL_dct = None if blind else LL_dct
+
+    def meets_psnr(alphas):
+        return psnr_stack(cover, watermarked_for_alphas(recon, delta, alphas)) >= min_psnr
+
+    def meets_nc(alphas):
+        images = watermarked_for_alphas(recon, delta, alphas)
+        if attack:
+            images = np.stack([apply_attack(attack, img, attack_param, seed) for img in images])
+        alphas = np.asarray(alphas, dtype=np.float64).reshape(-1, 1, 1)
+        marks = extract_watermark_dwtdct_batch(images, None, model, level, alphas, original_LL_dct)
+        return np.array([normalized_correlation(watermark, mark) >= min_nc for mark in marks])
+
+    if min_psnr is None:
+        return find_alpha(meets_nc, alpha_range, tolerance=tolerance, strongest=False)
+
+    alpha = find_alpha(meets_psnr, alpha_range, tolerance=tolerance, strongest=True)
+    if alpha is None or min_nc is None:
+        return alpha
+    return alpha if meets_nc(np.array([alpha]))[0] else None
@@ -0,0 +1,127 @@
+"""Background job execution for the WaveSecure GUI.
+
+Tk widgets may only be touched from the main thread, so jobs run on a
+worker thread and report back through an event queue that the GUI drains
+with `JobExecutor.poll()` from a periodic `after()` callback. Callbacks
+passed to `submit` are therefore always invoked on the polling thread.
+"""
+import queue
+import threading
+
+class JobCancelled(Exception):
+    """Raised inside a job when it has been cancelled"""
+
+class Job:
+    """A unit of work with a name, progress reporting and cooperative cancellation"""
+
+    def __init__(self, name, func, on_done=None, on_error=None, on_cancel=None):
+        self.name = name
+        self.func = func
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_cancel = on_cancel
+        self._cancel_event = threading.Event()
+        self._events = None
+
+    @property
+    def cancelled(self):
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def check_cancelled(self):
+        if self._cancel_event.is_set():
+            raise JobCancelled(self.name)
+
+    def progress(self, message):
+        """Report the current stage; also a cancellation point between stages"""
+        self.check_cancelled()
+        self._events.put(("progress", self, message))
+
+class JobExecutor:
+    """Runs submitted jobs in order on a single background thread"""
+
+    def __init__(self):
+        self._jobs = queue.Queue()
+        self._events = queue.Queue()
+        self._pending = []
+        self._current = None
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="wavesecure-jobs", daemon=True)
+        self._worker.start()
+
+    def submit(self, name, func, on_done=None, on_error=None, on_cancel=None):
+        """Queue `func(job)` to run in the background and return its Job"""
+        job = Job(name, func, on_done, on_error, on_cancel)
+        job._events = self._events
+        with self._lock:
+            self._pending.append(job)
+        self._jobs.put(job)
+        return job
+
+    @property
+    def current(self):
+        return self._current
+
+    def pending_count(self):
+        """Number of jobs waiting behind the one currently running"""
+        with self._lock:
+            return len(self._pending)
+
+    def cancel_current(self):
+        """Cancel the running job; returns False if nothing is running"""
+        job = self._current
+        if job is None:
+            return False
+        job.cancel()
+        return True
+
+    def cancel_all(self):
+        with self._lock:
+            jobs = list(self._pending)
+        for job in jobs:
+            job.cancel()
+        self.cancel_current()
+
+    def shutdown(self):
+        self.cancel_all()
+        self._jobs.put(None)
+
+    def poll(self):
+        """Dispatch queued events; returns the progress messages seen, in order"""
+        messages = []
+        while True:
+            try:
+                kind, job, payload = self._events.get_nowait()
+            except queue.Empty:
+                return messages
+
+            if kind == "progress":
+                messages.append((job, payload))
+            elif kind == "done" and job.on_done:
+                job.on_done(payload)
+            elif kind == "error" and job.on_error:
+                job.on_error(payload)
+            elif kind == "cancelled" and job.on_cancel:
+                job.on_cancel()
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            with self._lock:
+                self._pending.remove(job)
+            self._current = job
+            try:
+                job.check_cancelled()
+                result = job.func(job)
+                job.check_cancelled()
+                self._events.put(("done", job, result))
+            except JobCancelled:
+                self._events.put(("cancelled", job, None))
+            except Exception as e:
+                self._events.put(("error", job, e))
+            finally:
+                self._current = None
@@ -0,0 +1,39 @@
+"""Image and watermark quality metrics."""
+import cv2
+import numpy as np
+
+def normalized_correlation(watermark, extracted):
+    """NC between the embedded and extracted watermark (1.0 is a perfect match).
+
+    Both are mean-removed first, so a flat extraction scores 0 rather than
+    the near-1 an uncentered NC gives grayscale marks.
+    """
+    w = watermark.astype(np.float64).ravel()
+    e = np.clip(extracted, 0, 255).astype(np.float64).ravel()
+    w -= w.mean()
+    e -= e.mean()
+    denominator = np.sqrt(np.dot(w, w) * np.dot(e, e))
+    return float(np.dot(w, e) / denominator) if denominator else 0.0
+
+def bit_error_rate(watermark, extracted, threshold=128):
+    """Fraction of pixels on the wrong side of `threshold` after extraction"""
+    return float(np.mean((watermark >= threshold) != (np.clip(extracted, 0, 255) >= threshold)))
+
+def psnr(reference, image):
+    return float(cv2.PSNR(reference, image))
+
+def ssim(reference, image):
+    """Mean structural similarity of two grayscale images (Gaussian window, sigma 1.5)"""
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    x = reference.astype(np.float64)
+    y = image.astype(np.float64)
+
+    def blur(a):
+        return cv2.GaussianBlur(a, (11, 11), 1.5)
+
+    mu_x, mu_y = blur(x), blur(y)
+    sigma_x = blur(x * x) - mu_x ** 2
+    sigma_y = blur(y * y) - mu_y ** 2
+    sigma_xy = blur(x * y) - mu_x * mu_y
+    ssim_map = ((2 * mu_x * mu_y + c1) * (2 * sigma_xy + c2)) / ((mu_x ** 2 + mu_y ** 2 + c1) * (sigma_x + sigma_y + c2))
+    return float(ssim_map.mean())
@@ -0,0 +1,239 @@
+"""Registry of issued watermarks for identifying which one a suspect carries.
+
+Every registered watermark is reduced to a small mean-removed, unit-length
+vector (32x32 by default) and stored as one row of a memory-mapped float32
+matrix. The dot product of two such vectors is their normalized
+correlation, so a suspect is scored against every registered mark with a
+single matrix-vector product over the mapped rows, and the top-k rows are
+picked with a partial sort. At 32x32 a registry of 100k marks is 400 MB on
+disk, paged in by the OS as needed.
+
+    python -m wavesecure.registry add marks/ customer_*.png
+    python -m wavesecure.registry identify marks/ leaked.jpg --original master.png
+"""
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+VECTORS_FILE = "vectors.npy"
+INDEX_FILE = "index.json"
+IDS_FILE = "ids.jsonl"
+
+def watermark_vectors(watermarks, shape=(32, 32)):
+    """(N, h*w) float32 rows: each watermark area-resized to `shape`, mean-removed and scaled to unit length"""
+    import cv2
+    # Raw extractions have huge outliers where the original's coefficients are near zero;
+    # clipping to the pixel range (as the GUI does before display) keeps them from dominating
+    watermarks = np.clip(np.asarray(watermarks, dtype=np.float32), 0, 255)
+    if watermarks.ndim == 2:
+        watermarks = watermarks[None]
+    rows = np.stack([
+        cv2.resize(mark, (shape[1], shape[0]), interpolation=cv2.INTER_AREA).ravel() for mark in watermarks
+    ])
+    rows -= rows.mean(axis=1, keepdims=True)
+    norms = np.linalg.norm(rows, axis=1, keepdims=True)
+    return np.divide(rows, norms, out=np.zeros_like(rows), where=norms > 0)
+
+class WatermarkRegistry:
+    """Append-only store of watermark vectors in a directory, opened or created at `path`"""
+
+    def __init__(self, path, shape=(32, 32), initial_capacity=1024):
+        self.path = path
+        index_path = os.path.join(path, INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, encoding="utf-8") as f:
+                index = json.load(f)
+            self.shape = tuple(index["shape"])
+            self._matrix = np.load(os.path.join(path, VECTORS_FILE), mmap_mode="r+")
+            if "ids" in index:
+                # Older registries kept the ids inside index.json; move them to the append-only file
+                self.ids = index["ids"]
+                open(os.path.join(path, IDS_FILE), "w").close()
+                self._append_ids(self.ids)
+                self._save_index()
+            else:
+                self.ids = self._load_ids()
+        else:
+            os.makedirs(path, exist_ok=True)
+            self.shape = tuple(shape)
+            self.ids = []
+            self._matrix = self._allocate(initial_capacity)
+            self._append_ids([])
+            self._save_index()
+        self._positions = {watermark_id: i for i, watermark_id in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, watermark_id):
+        return watermark_id in self._positions
+
+    @property
+    def dimension(self):
+        return self.shape[0] * self.shape[1]
+
+    @property
+    def vectors(self):
+        """Memory-mapped (N, dimension) matrix of the registered vectors"""
+        return self._matrix[:len(self.ids)]
+
+    def _allocate(self, capacity, path=None):
+        path = path or os.path.join(self.path, VECTORS_FILE)
+        return np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(capacity, self.dimension))
+
+    def _grow(self, needed):
+        """Move the vectors into a larger file, swapped in atomically so a crash never leaves the index unbacked"""
+        capacity = self._matrix.shape[0]
+        while capacity < needed:
+            capacity *= 2
+        path = os.path.join(self.path, VECTORS_FILE)
+        grown = self._allocate(capacity, path + ".tmp")
+        grown[:len(self.ids)] = self.vectors
+        grown.flush()
+        del grown, self._matrix  # release both mappings before the file is replaced
+        os.replace(path + ".tmp", path)
+        self._matrix = np.load(path, mmap_mode="r+")
+
+    def _save_index(self):
+        """Write the registry metadata; the ids live in IDS_FILE"""
+        index_path = os.path.join(self.path, INDEX_FILE)
+        with open(index_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(dict(shape=list(self.shape)), f)
+        os.replace(index_path + ".tmp", index_path)
+
+    def _append_ids(self, watermark_ids):
+        """Append ids to IDS_FILE, one JSON string per line, so each add costs O(new ids) I/O"""
+        with open(os.path.join(self.path, IDS_FILE), "a", encoding="utf-8") as f:
+            f.writelines(json.dumps(watermark_id) + "\n" for watermark_id in watermark_ids)
+
+    def _load_ids(self):
+        """Read IDS_FILE, dropping a final line left incomplete by an interrupted append"""
+        ids_path = os.path.join(self.path, IDS_FILE)
+        with open(ids_path, "rb") as f:
+            data = f.read()
+        complete = data[:data.rfind(b"\n") + 1]
+        if len(complete) != len(data):
+            with open(ids_path, "r+b") as f:
+                f.truncate(len(complete))
+        return [json.loads(line) for line in complete.decode("utf-8").splitlines()]
+
+    def add(self, watermark_ids, watermarks):
+        """Register watermarks under new, unique ids; returns their row numbers"""
+        if isinstance(watermark_ids, str):
+            watermark_ids, watermarks = [watermark_ids], [watermarks]
+        duplicates = [i for i in watermark_ids if i in self._positions]
+        if duplicates or len(set(watermark_ids)) != len(watermark_ids):
+            raise ValueError(f"Watermark ids already registered or repeated: {duplicates or watermark_ids}")
+
+        rows = watermark_vectors(watermarks, self.shape)
+        start = len(self.ids)
+        if start + len(rows) > self._matrix.shape[0]:
+            self._grow(start + len(rows))
+        self._matrix[start:start + len(rows)] = rows
+        self._matrix.flush()
+
+        # Vectors are flushed first, so every id on disk has its row
+        self._append_ids(watermark_ids)
+        self.ids.extend(watermark_ids)
+        self._positions.update((watermark_id, start + i) for i, watermark_id in enumerate(watermark_ids))
+        return list(range(start, start + len(rows)))
+
+    def scores(self, extracted):
+        """Normalized correlation of one or more extracted watermarks with every registered mark.
+
+        Returns an (N,) array for one watermark or (M, N) for a stack of M.
+        """
+        queries = watermark_vectors(extracted, self.shape)
+        scores = queries @ self.vectors.T
+        return scores[0] if np.ndim(extracted) == 2 else scores
+
+    def identify(self, extracted, k=5):
+        """Top-k registered marks for an extracted watermark, best first.
+
+        Each match is a dict with the id, its normalized correlation `score`
+        and `z`, how many robust standard deviations (median absolute
+        deviation) it stands above the scores of the whole registry; a
+        genuine match typically stands far above the rest. For an (M, h, w)
+        stack of extracted watermarks, returns one such list per watermark.
+        """
+        if np.ndim(extracted) not in (2, 3):
+            raise ValueError(f"Expected an (h, w) watermark or an (M, h, w) stack, got shape {np.shape(extracted)}")
+        if not len(self):
+            return [] if np.ndim(extracted) == 2 else [[] for _ in extracted]
+        scores = self.scores(extracted)
+        if scores.ndim == 2:
+            return [self._top_matches(row, k) for row in scores]
+        return self._top_matches(scores, k)
+
+    def _top_matches(self, scores, k):
+        k = min(k, len(scores))
+        top = np.argpartition(scores, -k)[-k:]
+        top = top[np.argsort(scores[top])[::-1]]
+
+        median = np.median(scores)
+        spread = 1.4826 * np.median(np.abs(scores - median))
+        return [
+            dict(id=self.ids[i], score=float(scores[i]), z=float((scores[i] - median) / spread) if spread > 0 else None)
+            for i in top
+        ]
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Register issued watermarks and identify which one a suspect carries.")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    add = subparsers.add_parser("add", help="Register watermark images (ids default to the file names)")
+    add.add_argument("registry", help="Registry directory (created if missing)")
+    add.add_argument("watermarks", nargs="+", help="Watermark images")
+    add.add_argument("--ids", nargs="+", default=None, help="Ids for the watermarks, in the same order")
+    add.add_argument("--shape", type=int, nargs=2, default=[32, 32], help="Vector size for a new registry")
+
+    identify = subparsers.add_parser("identify", help="Extract once and rank the registered marks")
+    identify.add_argument("registry", help="Registry directory")
+    identify.add_argument("suspect", help="Suspect image")
+    identify.add_argument("--original", default=None, help="Original image for non-blind extraction")
+    identify.add_argument("--wavelet", default="haar", help="Wavelet model (default: haar)")
+    identify.add_argument("--level", type=int, default=1, help="Decomposition level (default: 1)")
+    identify.add_argument("--alpha", type=float, default=0.1, help="Embedding strength (default: 0.1)")
+    identify.add_argument("-k", type=int, default=5, help="Number of matches to show (default: 5)")
+
+    info = subparsers.add_parser("info", help="Show registry size")
+    info.add_argument("registry", help="Registry directory")
+
+    return parser
+
+def main(argv=None):
+    from .core import convert_image, extract_watermark_dwtdct
+
+    args = build_parser().parse_args(argv)
+    if args.mode == "add":
+        ids = args.ids or [os.path.splitext(os.path.basename(path))[0] for path in args.watermarks]
+        if len(ids) != len(args.watermarks):
+            print(f"Got {len(ids)} ids for {len(args.watermarks)} watermarks", file=sys.stderr)
+            return 1
+        registry = WatermarkRegistry(args.registry, tuple(args.shape))
+        registry.add(ids, [convert_image(path, 128) for path in args.watermarks])
+        print(f"Registered {len(ids)} watermarks ({len(registry)} total)")
+        return 0
+
+    if not os.path.exists(os.path.join(args.registry, INDEX_FILE)):
+        print(f"No registry found at {args.registry}", file=sys.stderr)
+        return 1
+    registry = WatermarkRegistry(args.registry)
+    if args.mode == "info":
+        print(f"{len(registry)} watermarks, {registry.shape[0]}x{registry.shape[1]} vectors")
+        return 0
+
+    original = convert_image(args.original, 512) if args.original else None
+    extracted = extract_watermark_dwtdct(
+        convert_image(args.suspect, 512), original, args.wavelet, args.level, args.alpha
+    )
+    for rank, match in enumerate(registry.identify(extracted, args.k), 1):
+        z = "n/a" if match["z"] is None else f"{match['z']:.1f}"
+        print(f"{rank}. {match['id']}  NC {match['score']:.3f}  z {z}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
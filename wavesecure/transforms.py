@@ -0,0 +1,187 @@
+"""Selectable DCT/DWT backends for the watermarking pipeline.
+
+`apply_dct`, `apply_idct` and `process_coefficients` in wavesecure.core
+delegate to the active backend. All backends transform over the last two axes, so they
+accept single images and (N, H, W) stacks alike. In float32 mode (the
+default) arrays stay single precision end to end; float32 inputs are used
+without copying.
+
+    fftpack  legacy scipy.fftpack DCT
+    scipy    scipy.fft DCT, optionally multi-threaded via `workers`
+    opencv   cv2.dct, one 2D plane at a time
+
+The default can be set with the WAVESECURE_BACKEND environment variable.
+Run this module to check that every backend agrees with the reference
+(tests/test_transforms.py runs the same checks under pytest):
+
+    python -m wavesecure.transforms
+"""
+import os
+import sys
+
+import numpy as np
+
+class TransformBackend:
+    """Base backend; the DWT always goes through PyWavelets"""
+
+    name = None
+
+    def __init__(self, workers=None, float32=True):
+        self.workers = workers
+        self.float32 = float32
+
+    def __repr__(self):
+        return f"{type(self).__name__}(workers={self.workers}, float32={self.float32})"
+
+    @property
+    def dtype(self):
+        return np.float32 if self.float32 else np.float64
+
+    def prepare(self, array):
+        """Cast to the working dtype; a no-op (no copy) when it already matches"""
+        return np.asarray(array, dtype=self.dtype)
+
+    def dct2(self, array, overwrite=False):
+        raise NotImplementedError
+
+    def idct2(self, array, overwrite=False):
+        raise NotImplementedError
+
+    def wavedec2(self, array, model, level):
+        import pywt
+        return pywt.wavedec2(data=self.prepare(array), wavelet=model, level=level, axes=(-2, -1))
+
+    def waverec2(self, coeffs, model):
+        import pywt
+        return pywt.waverec2(coeffs=coeffs, wavelet=model, axes=(-2, -1))
+
+    def approximation(self, array, model, level):
+        """LL subband after `level` DWT steps, computing only the low-pass chain.
+
+        Equal (to rounding) to `wavedec2(array, model, level)[0]`, but each
+        step is just the decomposition low-pass filter and downsampling
+        along both axes; no detail subbands are computed or allocated.
+        """
+        import pywt
+        array = self.prepare(array)
+        lowpass = np.asarray(pywt.Wavelet(model).dec_lo, dtype=array.dtype)
+        for _ in range(level):
+            array = _lowpass_downsample(_lowpass_downsample(array, lowpass, -1), lowpass, -2)
+        return array
+
+class FftpackBackend(TransformBackend):
+    name = "fftpack"
+
+    def dct2(self, array, overwrite=False):
+        from scipy.fftpack import dct
+        return dct(dct(self.prepare(array), axis=-1, norm='ortho'), axis=-2, norm='ortho', overwrite_x=True)
+
+    def idct2(self, array, overwrite=False):
+        from scipy.fftpack import idct
+        return idct(idct(self.prepare(array), axis=-2, norm='ortho'), axis=-1, norm='ortho', overwrite_x=True)
+
+class ScipyFFTBackend(TransformBackend):
+    name = "scipy"
+
+    def dct2(self, array, overwrite=False):
+        from scipy.fft import dctn
+        return dctn(self.prepare(array), norm='ortho', axes=(-2, -1), workers=self.workers, overwrite_x=overwrite)
+
+    def idct2(self, array, overwrite=False):
+        from scipy.fft import idctn
+        return idctn(self.prepare(array), norm='ortho', axes=(-2, -1), workers=self.workers, overwrite_x=overwrite)
+
+class OpenCVBackend(TransformBackend):
+    name = "opencv"
+
+    def _apply(self, array, flags):
+        import cv2
+        array = self.prepare(array)
+        if array.ndim == 2:
+            return cv2.dct(np.ascontiguousarray(array), flags=flags)
+        out = np.empty_like(array)
+        planes = array.reshape(-1, *array.shape[-2:])
+        for plane, target in zip(planes, out.reshape(-1, *array.shape[-2:])):
+            cv2.dct(np.ascontiguousarray(plane), target, flags)
+        return out
+
+    def dct2(self, array, overwrite=False):
+        return self._apply(array, 0)
+
+    def idct2(self, array, overwrite=False):
+        import cv2
+        return self._apply(array, cv2.DCT_INVERSE)
+
+def _lowpass_downsample(array, lowpass, axis):
+    """One-axis approximation coefficients, matching PyWavelets' dwt in 'symmetric' mode"""
+    taps = len(lowpass)
+    length = (array.shape[axis] + taps - 1) // 2
+    padding = [(0, 0)] * array.ndim
+    padding[axis] = (taps - 1, taps - 1)
+    padded = np.moveaxis(np.pad(array, padding, mode="symmetric"), axis, -1)
+    # out[k] = sum_j lowpass[j] * x[2k + 1 - j], with x symmetrically extended
+    out = lowpass[0] * padded[..., taps:taps + 2 * length:2]
+    for j in range(1, taps):
+        out += lowpass[j] * padded[..., taps - j:taps - j + 2 * length:2]
+    return np.moveaxis(out, -1, axis)
+
+BACKENDS = {backend.name: backend for backend in (FftpackBackend, ScipyFFTBackend, OpenCVBackend)}
+
+_active = None
+
+def set_backend(name, workers=None, float32=True):
+    """Select the backend used by the watermarking functions and return it"""
+    global _active
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown transform backend '{name}'; choose from {', '.join(BACKENDS)}")
+    _active = BACKENDS[name](workers=workers, float32=float32)
+    return _active
+
+def get_backend():
+    """The active backend, created from WAVESECURE_BACKEND (default: scipy) on first use"""
+    if _active is None:
+        return set_backend(os.environ.get("WAVESECURE_BACKEND", "scipy"))
+    return _active
+
+def compare_backends(shape=(3, 256, 256), tolerance=1e-2, seed=0):
+    """Check every backend against a float64 fftpack reference.
+
+    Compares the forward DCT and the DCT round trip on random 8-bit image
+    data, checks that float32 mode really returns float32, and checks the
+    LL-only decomposition against PyWavelets. Returns a list of (backend,
+    check, max_error) tuples that failed; empty when all backends agree
+    within `tolerance`.
+    """
+    import pywt
+    data = np.random.default_rng(seed).integers(0, 256, shape).astype(np.float32)
+    reference = FftpackBackend(float32=False).dct2(data)
+
+    failures = []
+    for name, backend_class in BACKENDS.items():
+        for float32 in (True, False):
+            backend = backend_class(float32=float32)
+            label = f"{name}{'' if float32 else ' (float64)'}"
+            forward = backend.dct2(data)
+            roundtrip = backend.idct2(forward.copy())
+            if forward.dtype != backend.dtype or roundtrip.dtype != backend.dtype:
+                failures.append((label, f"dtype {forward.dtype}/{roundtrip.dtype}", None))
+            forward_error = float(np.max(np.abs(forward - reference)))
+            roundtrip_error = float(np.max(np.abs(roundtrip - data)))
+            if forward_error > tolerance:
+                failures.append((label, "forward DCT", forward_error))
+            if roundtrip_error > tolerance:
+                failures.append((label, "DCT round trip", roundtrip_error))
+            for model, level in (("haar", 1), ("db2", 3)):
+                LL = backend.approximation(data, model, level)
+                LL_error = float(np.max(np.abs(LL - pywt.wavedec2(data, model, level=level, axes=(-2, -1))[0])))
+                if LL.dtype != backend.dtype or LL_error > tolerance:
+                    failures.append((label, f"LL approximation ({model}, level {level})", LL_error))
+    return failures
+
+if __name__ == "__main__":
+    failures = compare_backends()
+    for label, check, error in failures:
+        print(f"FAILED {label}: {check}" + ("" if error is None else f" (max error {error:.3g})"))
+    if not failures:
+        print(f"All transform backends agree ({', '.join(BACKENDS)})")
+    sys.exit(1 if failures else 0)